@@ -0,0 +1,64 @@
+# async_crud.py
+"""Awaitable wrappers around crud.py for use from async routes.
+
+SQLite calls block, so they run on a dedicated executor sized to the
+connection pool instead of on the event loop (or on the shared default
+executor, which other libraries also use).
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import crud
+from database import POOL_SIZE
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db")
+    return _executor
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Run a blocking database call on the DB executor and await its result."""
+    loop = asyncio.get_running_loop()
+    # Carry contextvars over so request-scoped state is visible in the worker
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_get_executor(), call)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _wrap(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_in_db_thread(func, *args, **kwargs)
+    return wrapper
+
+
+create_author = _wrap(crud.create_author)
+get_authors = _wrap(crud.get_authors)
+get_author = _wrap(crud.get_author)
+get_author_json = _wrap(crud.get_author_json)
+get_authors_json = _wrap(crud.get_authors_json)
+get_authors_by_ids = _wrap(crud.get_authors_by_ids)
+create_genre = _wrap(crud.create_genre)
+get_genres = _wrap(crud.get_genres)
+get_genre = _wrap(crud.get_genre)
+get_genres_by_ids = _wrap(crud.get_genres_by_ids)
+create_book = _wrap(crud.create_book)
+get_books = _wrap(crud.get_books)
+get_book = _wrap(crud.get_book)
+get_books_by_ids = _wrap(crud.get_books_by_ids)
+get_books_by_genre = _wrap(crud.get_books_by_genre)
+search_books = _wrap(crud.search_books)
@@ -0,0 +1,146 @@
+# autocomplete.py
+"""In-memory prefix index over book titles and author names.
+
+Entries are kept in one sorted array of normalized keys per kind, so a
+lookup is one bisect plus a forward walk of at most ``limit`` entries
+(per kind when both are asked for). The index is built from the tables at
+startup and kept current by crud.create_book/create_author, also while a
+rebuild (after a seed) is reading the tables. It is per process: with
+several workers, rows created through another worker only show up here
+after a restart.
+"""
+import bisect
+import heapq
+import itertools
+import threading
+
+from database import get_db_connection
+
+BOOK = "book"
+AUTHOR = "author"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+class _Entries:
+    """Parallel arrays sorted by key for one kind of entry."""
+
+    def __init__(self, rows=()):
+        self.keys = [row[0] for row in rows]
+        self.texts = [row[1] for row in rows]
+        self.ids = [row[2] for row in rows]
+
+    def contains(self, key, item_id):
+        i = bisect.bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.ids[i] == item_id:
+                return True
+            i += 1
+        return False
+
+    def insert(self, key, text, item_id):
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.texts.insert(i, text)
+        self.ids.insert(i, item_id)
+
+    def matches(self, kind, prefix):
+        """Yield ``(key, text, kind, id)`` in key order for keys starting with ``prefix``."""
+        keys = self.keys
+        i = bisect.bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            yield keys[i], self.texts[i], kind, self.ids[i]
+            i += 1
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # One sorted array per kind, so a typed lookup never walks the other
+        self._kinds = {BOOK: _Entries(), AUTHOR: _Entries()}
+        # Rebuilds in progress, and the adds made while they read the tables
+        self._rebuilds = 0
+        self._added = []
+
+    def __len__(self):
+        return sum(len(entries.keys) for entries in self._kinds.values())
+
+    def _sorted(self, entries):
+        rows = {kind: [] for kind in self._kinds}
+        for kind, item_id, text in entries:
+            rows[kind].append((normalize(text), text, item_id))
+        return {kind: _Entries(sorted(kind_rows)) for kind, kind_rows in rows.items()}
+
+    def load(self, entries):
+        """Replace the contents with ``(kind, id, text)`` entries."""
+        kinds = self._sorted(entries)
+        with self._lock:
+            self._kinds = kinds
+
+    def rebuild(self, read_entries):
+        """Replace the contents with ``read_entries()`` while adds keep coming in.
+
+        Adds made meanwhile may have committed after the tables were read,
+        so they are replayed into the new arrays unless already there.
+        """
+        with self._lock:
+            self._rebuilds += 1
+        try:
+            kinds = self._sorted(read_entries())
+            with self._lock:
+                for kind, key, text, item_id in self._added:
+                    if not kinds[kind].contains(key, item_id):
+                        kinds[kind].insert(key, text, item_id)
+                self._kinds = kinds
+        finally:
+            with self._lock:
+                self._rebuilds -= 1
+                if not self._rebuilds:
+                    self._added = []
+
+    def add(self, kind: str, item_id: int, text: str):
+        key = normalize(text)
+        with self._lock:
+            self._kinds[kind].insert(key, text, item_id)
+            if self._rebuilds:
+                self._added.append((kind, key, text, item_id))
+
+    def lookup(self, prefix: str, limit: int = 10, kind=None):
+        """Return up to ``limit`` entries whose normalized text starts with ``prefix``.
+
+        Without ``kind`` the per-kind matches are merged in key order.
+        """
+        prefix = normalize(prefix)
+        results = []
+        if not prefix or limit <= 0:
+            return results
+        with self._lock:
+            if kind is None:
+                matches = heapq.merge(*(entries.matches(entry_kind, prefix)
+                                        for entry_kind, entries in self._kinds.items()))
+            else:
+                matches = self._kinds[kind].matches(kind, prefix)
+            for _, text, entry_kind, item_id in itertools.islice(matches, limit):
+                results.append({"type": entry_kind, "id": item_id, "text": text})
+        return results
+
+
+index = PrefixIndex()
+
+
+def _read_entries():
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, title FROM books')
+        entries = [(BOOK, row[0], row[1]) for row in cursor]
+        cursor.execute('SELECT id, name FROM authors')
+        entries.extend((AUTHOR, row[0], row[1]) for row in cursor)
+    return entries
+
+
+def build_index():
+    """Load every book title and author name into the shared index."""
+    index.rebuild(_read_entries)
+    return len(index)
@@ -0,0 +1,218 @@
+# benchmarks/bench_crud.py
+"""Time and allocations per call for each crud function as the catalog grows.
+
+A synthetic catalog (seeder.generate_catalog) is generated for each size
+in ``--sizes`` (books; authors are a twentieth of that, genres fixed)
+and cached under ``--data-dir`` for later runs. Every case then calls
+crud directly, first timed, then once more under tracemalloc for the peak
+bytes allocated during a call. The create_* cases run against a scratch
+copy of the catalog, so the cached one keeps its size from run to run.
+Cases whose time grows more than ``--cliff`` times from the smallest to
+the largest catalog are flagged. That is the shape of OFFSET pagination
+or an unbounded author page.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_crud                      # 1k, 100k and 1M books
+    python -m benchmarks.bench_crud --sizes 1000,100000 --output crud.json
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import pathlib
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+import crud
+import database
+import seeder
+from models import AuthorCreate, BookCreate, GenreCreate
+
+GENRES = 50
+# Cases that add rows; run on a copy of the catalog
+WRITE_CASES = ("create_author", "create_genre", "create_book")
+_names = itertools.count()
+
+
+def catalog_path(data_dir, books, seed):
+    return pathlib.Path(data_dir) / f"catalog-{books}-seed{seed}-v{len(database.MIGRATIONS)}.db"
+
+
+def open_catalog(path, books, seed):
+    """Point the database module at ``path``, generating the catalog if missing."""
+    database.close_db()
+    database.DATABASE_NAME = str(path)
+    exists = path.exists()
+    database.init_db()
+    if not exists:
+        print(f"generating {books} books into {path}", flush=True)
+        seeder.generate_catalog(max(1, books // 20), GENRES, books, seed=seed)
+
+
+def open_scratch_copy(path):
+    """Copy the catalog at ``path`` next to it and point the database module at the copy."""
+    database.close_db()
+    scratch = path.with_name(path.stem + "-scratch.db")
+    remove_database(scratch)
+    with contextlib.closing(sqlite3.connect(path)) as source, \
+            contextlib.closing(sqlite3.connect(scratch)) as target:
+        source.backup(target)
+    database.DATABASE_NAME = str(scratch)
+    database.init_db()
+    return scratch
+
+
+def remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        pathlib.Path(str(path) + suffix).unlink(missing_ok=True)
+
+
+def _fixtures(books, seed):
+    """Ids the cases need: random ones plus the heaviest author and genre."""
+    rng = random.Random(seed)
+    with database.get_db_connection() as conn:
+        counts = dict(conn.execute('SELECT name, count FROM row_counts').fetchall())
+        top_author = conn.execute(
+            'SELECT author_id, count FROM author_book_counts ORDER BY count DESC LIMIT 1').fetchone()
+        top_genre = conn.execute(
+            'SELECT genre_id FROM genre_book_counts ORDER BY count DESC LIMIT 1').fetchone()[0]
+    return {
+        "books": counts["books"],
+        "authors": counts["authors"],
+        "top_author": top_author[0],
+        "top_author_books": top_author[1],
+        "top_genre": top_genre,
+        "book_ids": [rng.randint(1, counts["books"]) for _ in range(64)],
+        "author_ids": [rng.randint(1, counts["authors"]) for _ in range(64)],
+    }
+
+
+def cases(f):
+    """(name, call) pairs; ``f`` are the fixtures of the open catalog."""
+    book_ids = itertools.cycle(f["book_ids"])
+    author_ids = itertools.cycle(f["author_ids"])
+    middle = f["books"] // 2
+
+    def unique_name(prefix):
+        return f"{prefix} {time.time_ns()}-{next(_names)}"
+
+    return [
+        ("get_books", lambda: crud.get_books(limit=20)),
+        ("get_books skip=half", lambda: crud.get_books(skip=middle, limit=20)),
+        ("get_books after=half", lambda: crud.get_books(after=middle, limit=20)),
+        ("get_book", lambda: crud.get_book(next(book_ids))),
+        ("get_books_by_ids x10", lambda: crud.get_books_by_ids([next(book_ids) for _ in range(10)])),
+        ("get_books_by_genre", lambda: crud.get_books_by_genre(f["top_genre"], limit=20)),
+        ("get_books_by_genre skip=1k",
+         lambda: crud.get_books_by_genre(f["top_genre"], skip=1000, limit=20)),
+        ("get_authors", lambda: crud.get_authors(limit=10)),
+        ("get_authors skip=half", lambda: crud.get_authors(skip=f["authors"] // 2, limit=10)),
+        ("get_author", lambda: crud.get_author(next(author_ids))),
+        ("get_author top", lambda: crud.get_author(f["top_author"])),
+        ("get_author_json top", lambda: crud.get_author_json(f["top_author"])),
+        ("get_authors_by_ids x10", lambda: crud.get_authors_by_ids([next(author_ids) for _ in range(10)])),
+        ("get_genres", lambda: crud.get_genres(limit=50)),
+        ("get_genre", lambda: crud.get_genre(f["top_genre"])),
+        ("search_books", lambda: crud.search_books("river storm", limit=10)),
+        ("create_author", lambda: crud.create_author(AuthorCreate(name=unique_name("Bench Author")))),
+        ("create_genre", lambda: crud.create_genre(GenreCreate(name=unique_name("Bench Genre")))),
+        ("create_book", lambda: crud.create_book(BookCreate(
+            title=unique_name("Bench Book"), author_id=next(author_ids), genre_id=f["top_genre"]))),
+    ]
+
+
+def measure(call, repeat, max_seconds):
+    """Return ``(median seconds per call, calls, peak bytes allocated in one call)``."""
+    call()  # warm up
+    timings = []
+    deadline = time.perf_counter() + max_seconds
+    while len(timings) < repeat and (len(timings) < 3 or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        call()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return timings[len(timings) // 2], len(timings), peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="crud micro-benchmarks across catalog sizes")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="comma-separated book counts")
+    parser.add_argument("--repeat", type=int, default=200, help="timed calls per case")
+    parser.add_argument("--max-seconds", type=float, default=2.0, help="time budget per case")
+    parser.add_argument("--seed", type=int, default=seeder.DEFAULT_SEED)
+    parser.add_argument("--data-dir", default=str(pathlib.Path(tempfile.gettempdir()) / "library-bench"))
+    parser.add_argument("--only", help="run only cases whose name contains this")
+    parser.add_argument("--cliff", type=float, default=10.0,
+                        help="flag cases slowing down more than this from smallest to largest size")
+    parser.add_argument("--output", help="write the JSON results here")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    pathlib.Path(args.data_dir).mkdir(parents=True, exist_ok=True)
+    results = {}
+    catalogs = {}
+    scratch = None
+
+    def run(name, call, books):
+        seconds, calls, peak = measure(call, args.repeat, args.max_seconds)
+        results.setdefault(name, {})[books] = {
+            "us_per_call": round(seconds * 1e6, 1),
+            "calls": calls,
+            "peak_bytes": peak,
+        }
+
+    try:
+        for books in sizes:
+            path = catalog_path(args.data_dir, books, args.seed)
+            open_catalog(path, books, args.seed)
+            fixtures = _fixtures(books, args.seed)
+            catalogs[books] = {key: fixtures[key] for key in ("books", "authors", "top_author_books")}
+            selected = [(name, call) for name, call in cases(fixtures)
+                        if not args.only or args.only in name]
+            for name, call in selected:
+                if name not in WRITE_CASES:
+                    run(name, call, books)
+            writes = [(name, call) for name, call in selected if name in WRITE_CASES]
+            if writes:
+                scratch = open_scratch_copy(path)
+                for name, call in writes:
+                    run(name, call, books)
+                database.close_db()
+                remove_database(scratch)
+                scratch = None
+    finally:
+        database.close_db()
+        if scratch is not None:
+            remove_database(scratch)
+
+    header = f"{'case':<28}" + "".join(f"{f'{books} us':>14}{'KiB':>9}" for books in sizes) + f"{'growth':>9}"
+    print(header)
+    for name, by_size in results.items():
+        line = f"{name:<28}"
+        for books in sizes:
+            line += f"{by_size[books]['us_per_call']:>14.1f}{by_size[books]['peak_bytes'] / 1024:>9.1f}"
+        growth = by_size[sizes[-1]]["us_per_call"] / max(by_size[sizes[0]]["us_per_call"], 0.1)
+        flag = "  <- cliff" if growth > args.cliff else ""
+        print(f"{line}{growth:>8.1f}x{flag}")
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(
+            {"sizes": sizes, "catalogs": catalogs, "cases": results}, indent=2) + "\n")
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_render.py
+"""Compare FastAPI's response_model serialization with rendering.render.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_render --rows 500 --repeat 200
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+import rendering
+from main import app
+from models import AuthorResponse, BookResponse, GenreResponse
+
+
+def make_books(count, offset=0):
+    return [
+        {
+            "id": offset + i,
+            "title": f"Book title number {offset + i}",
+            "description": f"A description of book {offset + i} that is a little longer",
+            "author_id": (offset + i) % 97 + 1,
+            "genre_id": (offset + i) % 13 + 1,
+            # crud rows carry these joined columns; the response model drops them
+            "author_name": "Some Author",
+            "genre_name": "Some Genre",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def make_authors(count):
+    return [
+        {"id": i, "name": f"Author {i}", "books": make_books(5, offset=i * 5)}
+        for i in range(1, count + 1)
+    ]
+
+
+def make_genres(count):
+    return [{"id": i, "name": f"Genre {i}"} for i in range(1, count + 1)]
+
+
+def route_field(path):
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == path and "GET" in route.methods:
+            return route.response_field
+    raise LookupError(path)
+
+
+_loop = asyncio.new_event_loop()
+
+
+def model_mode(field, rows):
+    # What FastAPI does for a route returning plain dicts
+    content = _loop.run_until_complete(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+
+def fast_mode(model, rows):
+    return rendering.render(model, rows, many=True)
+
+
+def timeit(func, repeat):
+    func()  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="response rendering benchmark")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    cases = [
+        ("/books/", BookResponse, make_books(args.rows)),
+        ("/authors/", AuthorResponse, make_authors(args.rows)),
+        ("/genres/", GenreResponse, make_genres(args.rows)),
+    ]
+    print(f"{'route':<12}{'rows':>6}{'model ms':>12}{'fast ms':>12}{'speedup':>10}")
+    for path, model, rows in cases:
+        field = route_field(path)
+        assert model_mode(field, rows) == fast_mode(model, rows), f"{path}: outputs differ"
+        slow = timeit(lambda: model_mode(field, rows), args.repeat)
+        fast = timeit(lambda: fast_mode(model, rows), args.repeat)
+        print(f"{path:<12}{len(rows):>6}{slow * 1000:>12.3f}{fast * 1000:>12.3f}{slow / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+# benchmarks/load_test.py
+"""HTTP load test: run main:app under uvicorn and drive a mix of read routes.
+
+By default a temporary database is seeded with a synthetic catalog
+(seeder.py) and a fresh server is started on it. Load is either closed
+loop (``--concurrency`` clients, each sending its next request when the
+previous one returns) or open loop (``--rate`` requests per second on a
+fixed schedule). In open loop, latency is measured from when a request
+was due, not when it was sent, so a stalled server is not hidden by the
+client slowing down.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --duration 30 --concurrency 32 --output base.json
+    python -m benchmarks.load_test --rate 500 --mix book=5,books_search=1 --env LIBRARY_RENDER_MODE=model
+    python -m benchmarks.load_test --compare base.json new.json
+
+The client is plain asyncio over keep-alive HTTP/1.1 connections. It is
+still Python, so at high rates check that the client is not the
+bottleneck: its CPU time is part of the results.
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# Placeholder values for route templates; they match the synthetic catalog
+SEARCH_WORDS = ("river", "kingdom", "garden", "storm", "crown", "winter", "silent", "archive")
+PREFIXES = ("the", "riv", "gar", "sto", "ada", "ben", "cla", "mei")
+AUTHOR_NAMES = ("Ada K. Abbot", "Ben Castilo", "Clara Mbeki", "Mei Nakamura", "Omar Rosi")
+
+# name -> (path template, default weight)
+ROUTES = {
+    "books_list": ("/books/?limit=20", 15),
+    "book": ("/books/{book}", 25),
+    "books_batch": ("/books/batch?ids={books}", 5),
+    "books_search": ("/books/search?q={word}", 10),
+    "authors_list": ("/authors/?limit=10", 5),
+    "author": ("/authors/{author}", 15),
+    "authors_search": ("/authors/search?name={name}", 5),
+    "genres_list": ("/genres/", 5),
+    "genre_books": ("/genres/{genre}/books?limit=20", 5),
+    "autocomplete": ("/autocomplete?prefix={prefix}", 10),
+}
+PERCENTILES = (50, 95, 99, 99.9)
+
+
+def parse_mix(text):
+    """Parse ``name=weight,...``; an empty string means the default weights."""
+    if not text:
+        return {name: weight for name, (template, weight) in ROUTES.items()}
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ROUTES:
+            raise SystemExit(f"unknown route {name!r}, expected one of {', '.join(ROUTES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class RequestGenerator:
+    """Pick routes by weight and fill in their placeholders, reproducibly."""
+
+    def __init__(self, mix, counts, seed):
+        self.rng = random.Random(seed)
+        self.names = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.names]
+        self.counts = counts
+
+    def _id(self, table):
+        return self.rng.randint(1, max(1, self.counts.get(table, 1)))
+
+    def next(self):
+        name = self.rng.choices(self.names, self.weights)[0]
+        template = ROUTES[name][0]
+        path = template.format(
+            book=self._id("books") if "{book}" in template else "",
+            books=",".join(str(self._id("books")) for _ in range(10)) if "{books}" in template else "",
+            author=self._id("authors") if "{author}" in template else "",
+            genre=self._id("genres") if "{genre}" in template else "",
+            word=self.rng.choice(SEARCH_WORDS),
+            prefix=self.rng.choice(PREFIXES),
+            name=urllib.parse.quote(self.rng.choice(AUTHOR_NAMES)),
+        )
+        return name, path
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client connection for GET requests."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        """Send a GET and read the whole response; returns the status code."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            return await self._get(path)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _get(self, path):
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n\r\n".encode())
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding":
+                chunked = "chunked" in value
+            elif name == "connection":
+                close = value == "close"
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif length:
+            await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Recorder:
+    def __init__(self, record_from):
+        self.record_from = record_from
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def add(self, name, started, latency, status):
+        if started < self.record_from:
+            return
+        self.latencies.setdefault(name, []).append(latency)
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 0 or status >= 500:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+async def _send(conn, name, path, due, recorder):
+    loop = asyncio.get_running_loop()
+    try:
+        status = await conn.get(path)
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+        status = 0
+    recorder.add(name, due, loop.time() - due, status)
+
+
+async def closed_loop(host, port, generator, recorder, concurrency, until):
+    loop = asyncio.get_running_loop()
+
+    async def client():
+        conn = Connection(host, port)
+        try:
+            while loop.time() < until:
+                name, path = generator.next()
+                await _send(conn, name, path, loop.time(), recorder)
+        finally:
+            conn.close()
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+
+async def open_loop(host, port, generator, recorder, rate, until, max_connections):
+    loop = asyncio.get_running_loop()
+    idle = []
+    available = asyncio.Semaphore(max_connections)
+    tasks = set()
+
+    async def request(name, path, due):
+        async with available:
+            conn = idle.pop() if idle else Connection(host, port)
+            try:
+                await _send(conn, name, path, due, recorder)
+            finally:
+                idle.append(conn)
+
+    start = loop.time()
+    for i in range(int((until - start) * rate)):
+        due = start + i / rate
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name, path = generator.next()
+        task = asyncio.create_task(request(name, path, due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    for conn in idle:
+        conn.close()
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies, statuses, errors, seconds):
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct:g}_ms"] = round(percentile(ordered, pct) * 1000, 3)
+    return summary
+
+
+def report(recorder, seconds):
+    routes = {
+        name: summarize(recorder.latencies[name], recorder.statuses[name],
+                        recorder.errors.get(name, 0), seconds)
+        for name in sorted(recorder.latencies)
+    }
+    statuses = {}
+    for counts in recorder.statuses.values():
+        for status, count in counts.items():
+            statuses[status] = statuses.get(status, 0) + count
+    overall = summarize(
+        [latency for latencies in recorder.latencies.values() for latency in latencies],
+        statuses, sum(recorder.errors.values()), seconds,
+    )
+    return {"overall": overall, "routes": routes}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get_json(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.load(response)
+
+
+def start_server(port, env, workers, timeout=60):
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+        "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+    ]
+    server = subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"server exited with {server.returncode}")
+        try:
+            return server, _get_json(f"http://127.0.0.1:{port}/stats")["counts"]
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("server did not come up")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    env = dict(os.environ)
+    for item in args.env:
+        name, _, value = item.partition("=")
+        env[name] = value
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.db:
+            env["LIBRARY_DB"] = str(pathlib.Path(args.db).absolute())
+        else:
+            env["LIBRARY_DB"] = str(pathlib.Path(tmp) / "load_test.db")
+            print(f"seeding {args.authors} authors, {args.genres} genres, {args.books} books", flush=True)
+            subprocess.run([
+                sys.executable, "seeder.py", "--db", env["LIBRARY_DB"], "--authors", str(args.authors),
+                "--genres", str(args.genres), "--books", str(args.books), "--seed", str(args.seed),
+            ], cwd=REPO_ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+        port = free_port()
+        server, counts = start_server(port, env, args.workers)
+        try:
+            generator = RequestGenerator(parse_mix(args.mix), counts, args.seed)
+            mode = f"rate={args.rate}/s" if args.rate else f"concurrency={args.concurrency}"
+            print(f"{mode} for {args.duration}s after {args.warmup}s warm-up", flush=True)
+            cpu_started = time.process_time()
+            results = asyncio.run(_drive(args, port, generator))
+            client_cpu = time.process_time() - cpu_started
+        finally:
+            server.terminate()
+            server.wait()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "mode": "open" if args.rate else "closed",
+            "concurrency": None if args.rate else args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "workers": args.workers,
+            "mix": parse_mix(args.mix),
+            "env": dict(item.partition("=")[::2] for item in args.env),
+            "catalog": counts,
+            "client_cpu_seconds": round(client_cpu, 3),
+        },
+        **results,
+    }
+
+
+async def _drive(args, port, generator):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    recorder = Recorder(record_from=started + args.warmup)
+    until = started + args.warmup + args.duration
+    if args.rate:
+        await open_loop("127.0.0.1", port, generator, recorder, args.rate, until, args.max_connections)
+    else:
+        await closed_loop("127.0.0.1", port, generator, recorder, args.concurrency, until)
+    return report(recorder, args.duration)
+
+
+def print_report(result):
+    header = f"{'route':<16}{'reqs':>8}{'err':>6}{'rps':>10}" + "".join(
+        f"{f'p{pct:g} ms':>11}" for pct in PERCENTILES)
+    print(header)
+    rows = list(result["routes"].items()) + [("overall", result["overall"])]
+    for name, summary in rows:
+        print(f"{name:<16}{summary['requests']:>8}{summary['errors']:>6}{summary['throughput_rps']:>10.1f}"
+              + "".join(f"{summary[f'p{pct:g}_ms']:>11.3f}" for pct in PERCENTILES))
+
+
+def compare(base_path, new_path):
+    """Print per-route throughput and percentile changes from ``base`` to ``new``."""
+    base = json.loads(pathlib.Path(base_path).read_text())
+    new = json.loads(pathlib.Path(new_path).read_text())
+    metrics = ["throughput_rps"] + [f"p{pct:g}_ms" for pct in PERCENTILES]
+    print(f"{'route':<16}{'metric':<16}{'base':>12}{'new':>12}{'change':>10}")
+    names = sorted(set(base["routes"]) & set(new["routes"])) + ["overall"]
+    for name in names:
+        before = base["overall"] if name == "overall" else base["routes"][name]
+        after = new["overall"] if name == "overall" else new["routes"][name]
+        for metric in metrics:
+            old, current = before[metric], after[metric]
+            change = f"{(current - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"{name:<16}{metric:<16}{old:>12.3f}{current:>12.3f}{change:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP load test for main:app")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files")
+    parser.add_argument("--db", help="use this existing database instead of seeding a temporary one")
+    parser.add_argument("--authors", type=int, default=2_000)
+    parser.add_argument("--genres", type=int, default=50)
+    parser.add_argument("--books", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42, help="seeds both the catalog and the request sequence")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop clients")
+    parser.add_argument("--rate", type=float, help="open-loop requests per second (overrides --concurrency)")
+    parser.add_argument("--max-connections", type=int, default=256, help="open-loop connection cap")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before that")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mix", default="", help=f"name=weight,... from: {', '.join(ROUTES)}")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra environment for the server, e.g. LIBRARY_CACHE_ENABLED=0")
+    parser.add_argument("--output", help="write the JSON results here")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    result = run(args)
+    print_report(result)
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(result, indent=2) + "\n")
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
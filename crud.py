@@ -1,50 +1,138 @@
 # crud.py
-from database import get_db_connection
+import json
+import re
+
+import autocomplete
+import fuzzy
+from database import get_db_connection, execute_write, notify_write, USE_BOOKS_VIEW
 from models import BookCreate, AuthorCreate, GenreCreate
 
+def _insert_author(conn, name):
+    cursor = conn.cursor()
+    cursor.execute('INSERT INTO authors (name) VALUES (?)', (name,))
+    return cursor.lastrowid
+
 def create_author(author: AuthorCreate):
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO authors (name) VALUES (?)', (author.name,))
-        conn.commit()
-        return {"id": cursor.lastrowid, "name": author.name}
+    author_id = execute_write(_insert_author, author.name)
+    notify_write('authors')
+    autocomplete.index.add(autocomplete.AUTHOR, author_id, author.name)
+    fuzzy.add_author(author_id, author.name)
+    return {"id": author_id, "name": author.name}
 
-def get_authors(skip: int = 0, limit: int = 10):
+def _attach_books(cursor, authors):
+    """Fill in ``books`` for a list of author dicts with a single query."""
+    books_by_author = {author['id']: [] for author in authors}
+    for author in authors:
+        author['books'] = books_by_author[author['id']]
+    if not authors:
+        return authors
+    # json_each keeps this one fixed statement whatever the page size
+    cursor.execute(
+        'SELECT * FROM books WHERE author_id IN (SELECT value FROM json_each(?)) ORDER BY author_id, id',
+        (json.dumps(list(books_by_author)),)
+    )
+    for row in cursor.fetchall():
+        books_by_author[row['author_id']].append(dict(row))
+    return authors
+
+def get_authors(skip: int = 0, limit: int = 10, after: int = 0):
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM authors LIMIT ? OFFSET ?', (limit, skip))
+        cursor.execute('SELECT * FROM authors WHERE id > ? ORDER BY id LIMIT ? OFFSET ?', (after, limit, skip))
         authors = [dict(row) for row in cursor.fetchall()]
-        
-        # Get books for each author
-        for author in authors:
-            cursor.execute('SELECT * FROM books WHERE author_id = ?', (author['id'],))
-            author['books'] = [dict(row) for row in cursor.fetchall()]
-        
-        return authors
+        return _attach_books(cursor, authors)
 
 def get_author(author_id: int):
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM authors WHERE id = ?', (author_id,))
-        author = cursor.fetchone()
-        if author:
-            author_dict = dict(author)
-            cursor.execute('SELECT * FROM books WHERE author_id = ?', (author_id,))
-            author_dict['books'] = [dict(row) for row in cursor.fetchall()]
-            return author_dict
+        cursor.execute('''
+            SELECT
+                a.name AS author_name,
+                b.id, b.title, b.description, b.author_id, b.genre_id
+            FROM authors a
+            LEFT JOIN books b ON b.author_id = a.id
+            WHERE a.id = ?
+            ORDER BY b.id
+        ''', (author_id,))
+        rows = cursor.fetchall()
+        if rows:
+            return {
+                "id": author_id,
+                "name": rows[0]['author_name'],
+                "books": [
+                    {key: row[key] for key in ('id', 'title', 'description', 'author_id', 'genre_id')}
+                    for row in rows if row['id'] is not None
+                ]
+            }
         return None
 
-def create_genre(genre: GenreCreate):
+def get_authors_by_ids(author_ids):
+    """Return the authors with the given ids, in the order requested."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT a.*
+            FROM json_each(?) j
+            JOIN authors a ON a.id = j.value
+            ORDER BY j.key
+        ''', (json.dumps(list(author_ids)),))
+        authors = [dict(row) for row in cursor.fetchall()]
+        return _attach_books(cursor, authors)
+
+# One author as the exact AuthorResponse JSON document, built inside SQLite.
+# json() keeps the nested array from being re-quoted as a string.
+_AUTHOR_JSON = '''
+    json_object(
+        'id', a.id,
+        'name', a.name,
+        'books', json((
+            SELECT json_group_array(json_object(
+                'id', b.id,
+                'title', b.title,
+                'description', b.description,
+                'author_id', b.author_id,
+                'genre_id', b.genre_id
+            ))
+            FROM (SELECT * FROM books WHERE author_id = a.id ORDER BY id) b
+        ))
+    )
+'''
+
+def get_author_json(author_id: int):
+    """Return the author's AuthorResponse document as a JSON string, or None."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT ' + _AUTHOR_JSON + ' FROM authors a WHERE a.id = ?', (author_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+def get_authors_json(skip: int = 0, limit: int = 10, after: int = 0):
+    """Return ``(json_array, last_id, count)`` for a page of authors, built in one query."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('INSERT INTO genres (name) VALUES (?)', (genre.name,))
-        conn.commit()
-        return {"id": cursor.lastrowid, "name": genre.name}
+        cursor.execute(
+            'SELECT json_group_array(json(doc)), max(id), count(*) FROM ('
+            '    SELECT a.id AS id, ' + _AUTHOR_JSON + ' AS doc FROM authors a'
+            '    WHERE a.id > ? ORDER BY a.id LIMIT ? OFFSET ?'
+            ')',
+            (after, limit, skip)
+        )
+        return tuple(cursor.fetchone())
+
+def _insert_genre(conn, name):
+    cursor = conn.cursor()
+    cursor.execute('INSERT INTO genres (name) VALUES (?)', (name,))
+    return cursor.lastrowid
 
-def get_genres(skip: int = 0, limit: int = 10):
+def create_genre(genre: GenreCreate):
+    genre_id = execute_write(_insert_genre, genre.name)
+    notify_write('genres')
+    return {"id": genre_id, "name": genre.name}
+
+def get_genres(skip: int = 0, limit: int = 10, after: int = 0):
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM genres LIMIT ? OFFSET ?', (limit, skip))
+        cursor.execute('SELECT * FROM genres WHERE id > ? ORDER BY id LIMIT ? OFFSET ?', (after, limit, skip))
         return [dict(row) for row in cursor.fetchall()]
 
 def get_genre(genre_id: int):
@@ -54,25 +142,49 @@ def get_genre(genre_id: int):
         genre = cursor.fetchone()
         return dict(genre) if genre else None
 
-def create_book(book: BookCreate):
+def get_genres_by_ids(genre_ids):
+    """Return the genres with the given ids, in the order requested."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO books (title, description, author_id, genre_id) VALUES (?, ?, ?, ?)',
-            (book.title, book.description, book.author_id, book.genre_id)
-        )
-        conn.commit()
-        return {
-            "id": cursor.lastrowid,
-            "title": book.title,
-            "description": book.description,
-            "author_id": book.author_id,
-            "genre_id": book.genre_id
-        }
-
-def get_books(skip: int = 0, limit: int = 10):
+        cursor.execute('''
+            SELECT g.*
+            FROM json_each(?) j
+            JOIN genres g ON g.id = j.value
+            ORDER BY j.key
+        ''', (json.dumps(list(genre_ids)),))
+        return [dict(row) for row in cursor.fetchall()]
+
+def _insert_book(conn, book):
+    cursor = conn.cursor()
+    cursor.execute(
+        'INSERT INTO books (title, description, author_id, genre_id) VALUES (?, ?, ?, ?)',
+        (book.title, book.description, book.author_id, book.genre_id)
+    )
+    return cursor.lastrowid
+
+def create_book(book: BookCreate):
+    book_id = execute_write(_insert_book, book)
+    notify_write('books')
+    autocomplete.index.add(autocomplete.BOOK, book_id, book.title)
+    return {
+        "id": book_id,
+        "title": book.title,
+        "description": book.description,
+        "author_id": book.author_id,
+        "genre_id": book.genre_id
+    }
+
+def get_books(skip: int = 0, limit: int = 10, after: int = 0):
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        if USE_BOOKS_VIEW:
+            cursor.execute('''
+                SELECT * FROM books_view
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ? OFFSET ?
+            ''', (after, limit, skip))
+            return [dict(row) for row in cursor.fetchall()]
         cursor.execute('''
             SELECT 
                 b.*,
@@ -81,13 +193,19 @@ def get_books(skip: int = 0, limit: int = 10):
             FROM books b
             LEFT JOIN authors a ON b.author_id = a.id
             LEFT JOIN genres g ON b.genre_id = g.id
+            WHERE b.id > ?
+            ORDER BY b.id
             LIMIT ? OFFSET ?
-        ''', (limit, skip))
+        ''', (after, limit, skip))
         return [dict(row) for row in cursor.fetchall()]
 
 def get_book(book_id: int):
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        if USE_BOOKS_VIEW:
+            cursor.execute('SELECT * FROM books_view WHERE id = ?', (book_id,))
+            book = cursor.fetchone()
+            return dict(book) if book else None
         cursor.execute('''
             SELECT 
                 b.*,
@@ -101,9 +219,34 @@ def get_book(book_id: int):
         book = cursor.fetchone()
         return dict(book) if book else None
 
-def get_books_by_genre(genre_id: int, skip: int = 0, limit: int = 10):
+def get_books_by_ids(book_ids):
+    """Return the books with the given ids, in the order requested."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute('''
+            SELECT 
+                b.*,
+                a.name as author_name,
+                g.name as genre_name
+            FROM json_each(?) j
+            JOIN books b ON b.id = j.value
+            LEFT JOIN authors a ON b.author_id = a.id
+            LEFT JOIN genres g ON b.genre_id = g.id
+            ORDER BY j.key
+        ''', (json.dumps(list(book_ids)),))
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_books_by_genre(genre_id: int, skip: int = 0, limit: int = 10, after: int = 0):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if USE_BOOKS_VIEW:
+            cursor.execute('''
+                SELECT * FROM books_view
+                WHERE genre_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ? OFFSET ?
+            ''', (genre_id, after, limit, skip))
+            return [dict(row) for row in cursor.fetchall()]
         cursor.execute('''
             SELECT 
                 b.*,
@@ -112,7 +255,37 @@ def get_books_by_genre(genre_id: int, skip: int = 0, limit: int = 10):
             FROM books b
             LEFT JOIN authors a ON b.author_id = a.id
             LEFT JOIN genres g ON b.genre_id = g.id
-            WHERE b.genre_id = ?
+            WHERE b.genre_id = ? AND b.id > ?
+            ORDER BY b.id
             LIMIT ? OFFSET ?
-        ''', (genre_id, limit, skip))
-        return [dict(row) for row in cursor.fetchall()]
\ No newline at end of file
+        ''', (genre_id, after, limit, skip))
+        return [dict(row) for row in cursor.fetchall()]
+
+def _fts_query(text: str):
+    """Quote each word so user input is matched literally, never parsed as FTS5 syntax."""
+    return ' '.join('"%s"' % word for word in re.findall(r'\w+', text))
+
+def search_books(query: str, limit: int = 10, after_rank=None, after_id: int = 0):
+    """Full-text search over title and description, best BM25 match first."""
+    match = _fts_query(query)
+    if not match:
+        return []
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT 
+                b.*,
+                a.name as author_name,
+                g.name as genre_name,
+                snippet(books_fts, -1, '[', ']', '...', 12) as snippet,
+                books_fts.rank as rank
+            FROM books_fts
+            JOIN books b ON b.id = books_fts.rowid
+            LEFT JOIN authors a ON b.author_id = a.id
+            LEFT JOIN genres g ON b.genre_id = g.id
+            WHERE books_fts MATCH ?
+              AND (? IS NULL OR books_fts.rank > ? OR (books_fts.rank = ? AND books_fts.rowid > ?))
+            ORDER BY books_fts.rank, books_fts.rowid
+            LIMIT ?
+        ''', (match, after_rank, after_rank, after_rank, after_id, limit))
+        return [dict(row) for row in cursor.fetchall()]
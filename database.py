@@ -1,53 +1,984 @@
 import sqlite3
-from contextlib import contextmanager
+from contextlib import closing, contextmanager
+import contextvars
 import os
+import pathlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+import query_budget
+
+DATABASE_NAME = os.environ.get("LIBRARY_DB", "library.db")
+
+# Connection pool settings
+POOL_SIZE = int(os.environ.get("LIBRARY_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("LIBRARY_DB_POOL_TIMEOUT", "5.0"))
+# Idle connections older than this are pinged before being handed out
+POOL_HEALTH_CHECK_AFTER = float(os.environ.get("LIBRARY_DB_POOL_HEALTH_CHECK_AFTER", "30.0"))
+
+# Group commit for the writer queue; a window of 0 commits every write on its own
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("LIBRARY_DB_GROUP_COMMIT_WINDOW_MS", "0"))
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("LIBRARY_DB_GROUP_COMMIT_MAX_BATCH", "64"))
+
+# PRAGMA profiles applied once to every new connection.
+# cache_size is negative so it is read as KiB rather than pages.
+PERFORMANCE_PROFILES = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "read-heavy": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -128000,
+        "mmap_size": 512 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+}
+PERFORMANCE_PROFILE = os.environ.get("LIBRARY_DB_PROFILE", "balanced")
+if PERFORMANCE_PROFILE not in PERFORMANCE_PROFILES:
+    raise ValueError(
+        f"Unknown LIBRARY_DB_PROFILE {PERFORMANCE_PROFILE!r}, "
+        f"expected one of {sorted(PERFORMANCE_PROFILES)}"
+    )
+
+
+# Keep the trigger-maintained books_view table and read book listings from
+# it instead of joining authors and genres on every call
+USE_BOOKS_VIEW = os.environ.get("LIBRARY_USE_BOOKS_VIEW", "0") == "1"
+
+# Applied to the writer connection for the duration of a bulk load (seeder).
+# A crash mid-load can lose the load itself, which is simply rerun.
+BULK_LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "cache_size": -256000,
+    "temp_store": "MEMORY",
+    "wal_autocheckpoint": 100000,
+}
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+def _observe(sql, seconds, count=1):
+    if metrics.METRICS_ENABLED:
+        metrics.observe_query(sql, seconds, count)
+    query_budget.observe(sql, seconds, count)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor recording statement counts and time in ``metrics`` and ``query_budget``."""
+
+    _statement = None
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._statement = sql
+            _observe(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self._statement = sql
+            _observe(sql, time.perf_counter() - started)
+
+    # SQLite produces rows lazily, so fetching is part of a statement's cost
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            if self._statement is not None:
+                _observe(self._statement, time.perf_counter() - started, count=0)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            if self._statement is not None:
+                _observe(self._statement, time.perf_counter() - started, count=0)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            if self._statement is not None:
+                _observe(self._statement, time.perf_counter() - started, count=0)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (and execute shortcuts) are instrumented."""
+
+    kind = "write"
+    _closed = False
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts would bypass the cursor subclass's execute
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            if metrics.METRICS_ENABLED:
+                metrics.DB_CONNECTIONS_CLOSED.inc(self.kind)
+        super().close()
+
+
+def _connect(readonly=False):
+    instrumented = metrics.METRICS_ENABLED or query_budget.ENABLED
+    factory = InstrumentedConnection if instrumented else sqlite3.Connection
+    if readonly:
+        uri = pathlib.Path(DATABASE_NAME).absolute().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory)
+    else:
+        conn = sqlite3.connect(DATABASE_NAME, check_same_thread=False, factory=factory)
+    if instrumented:
+        conn.kind = "read" if readonly else "write"
+    if metrics.METRICS_ENABLED:
+        metrics.DB_CONNECTIONS_OPENED.inc("read" if readonly else "write")
+    conn.row_factory = sqlite3.Row
+    _apply_profile(conn, PERFORMANCE_PROFILES[PERFORMANCE_PROFILE], readonly)
+    return conn
+
+
+def _apply_profile(conn, profile, readonly=False):
+    # journal_mode is persistent in the file, the rest are per connection
+    for name, value in profile.items():
+        if readonly and name == "journal_mode":
+            continue
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def profile_settings():
+    """Return the active profile name and the PRAGMA values it applies."""
+    return {"name": PERFORMANCE_PROFILE, **PERFORMANCE_PROFILES[PERFORMANCE_PROFILE]}
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by all threads."""
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_after=POOL_HEALTH_CHECK_AFTER, readonly=False):
+        self.size = size
+        self.readonly = readonly
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        # Idle connections as (conn, returned_at); LIFO keeps the page cache warm
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._created = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(
+                f"No database connection available after {self.timeout}s"
+            )
+        try:
+            # Opening and pinging connections is not the request's own work
+            with query_budget.paused():
+                conn = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                conn = _connect(readonly=self.readonly)
+                with self._lock:
+                    self._created += 1
+                return conn
+            if time.monotonic() - returned_at < self.health_check_after:
+                return conn
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._discarded += 1
+
+    def close_idle(self):
+        """Close every idle connection, e.g. before the database file is replaced."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "created": self._created,
+                "discarded": self._discarded,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_avg_ms": round(self._wait_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+def _set_pragmas(conn, pragmas):
+    """Apply ``pragmas`` and return the values they replaced."""
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in pragmas}
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return previous
+
+
+class DatabaseWriter:
+    """Single writer connection fed by an in-process queue of write jobs.
+
+    A job is ``func(conn, *args)``; it runs inside a transaction on the
+    writer thread and must not commit itself. Funnelling every write
+    through one connection means callers queue here instead of fighting
+    over the SQLite write lock.
+
+    With a non-zero ``window`` (group commit), jobs arriving within that
+    many seconds of each other, up to ``max_batch`` of them, share one
+    transaction and one fsync. Each job still runs in its own savepoint
+    and its caller only gets a result after the shared COMMIT succeeds.
+    """
+
+    def __init__(self, window=0.0, max_batch=1):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        # A PRAGMA job pulled in while gathering a batch, run on the next round
+        self._held = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._batches = 0
+        self._errors = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def submit(self, func, *args):
+        """Queue a write job and return a Future for its result.
+
+        The job runs in a copy of the caller's context, so contextvars
+        (the per-request query count, for one) follow it to the writer.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((func, args, future, time.perf_counter(), contextvars.copy_context()))
+        return future
+
+    def set_pragmas(self, pragmas):
+        """Queue PRAGMA changes for the writer connection.
+
+        They run between transactions (some PRAGMAs refuse to change inside
+        one); the Future resolves to the previous values.
+        """
+        return self.submit(_set_pragmas, pragmas)
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="db-writer", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        """Finish queued jobs, then close the writer connection."""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        conn = _connect()
+        # Transactions are managed explicitly below
+        conn.isolation_level = None
+        try:
+            while True:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._execute_batch(conn, batch)
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        """Block for one job, then gather more while the group-commit window is open."""
+        job = self._held if self._held is not None else self._queue.get()
+        self._held = None
+        if job is None:
+            return [], True
+        batch = [job]
+        if job[0] is _set_pragmas or self.window <= 0 or self.max_batch <= 1:
+            return batch, False
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            if job[0] is _set_pragmas:
+                self._held = job
+                break
+            batch.append(job)
+        return batch, False
+
+    def _execute_batch(self, conn, batch):
+        batch = [job for job in batch if job[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        if batch[0][0] is _set_pragmas:
+            func, args, future, enqueued_at, context = batch[0]
+            try:
+                future.set_result(func(conn, *args))
+            except Exception as exc:
+                future.set_exception(exc)
+            return
+        # Each job gets its own savepoint so one failure does not undo its neighbours
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for func, args, future, enqueued_at, context in batch:
+                if len(batch) == 1:
+                    outcomes.append((True, context.run(func, conn, *args)))
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    result = context.run(func, conn, *args)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO job")
+                    outcomes.append((False, exc))
+                else:
+                    outcomes.append((True, result))
+                conn.execute("RELEASE job")
+            committing = time.perf_counter()
+            conn.execute("COMMIT")
+            if metrics.METRICS_ENABLED:
+                metrics.DB_COMMITS.observe(time.perf_counter() - committing)
+        except BaseException as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Nothing was committed, so every caller sees the failure
+            outcomes = [(False, exc)] * len(batch)
+        with self._lock:
+            self._batches += 1
+        # Results are only released once the commit is durable
+        for (func, args, future, enqueued_at, context), (ok, value) in zip(batch, outcomes):
+            self._record(enqueued_at, failed=not ok)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _record(self, enqueued_at, failed=False):
+        latency = time.perf_counter() - enqueued_at
+        with self._lock:
+            self._writes += 1
+            self._errors += failed
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+
+    def stats(self):
+        with self._lock:
+            writes = self._writes
+            return {
+                "group_commit_window_ms": self.window * 1000,
+                "group_commit_max_batch": self.max_batch,
+                "queue_depth": self._queue.qsize(),
+                "writes": writes,
+                "commits": self._batches,
+                "avg_batch_size": round(writes / self._batches, 2) if self._batches else 0.0,
+                "errors": self._errors,
+                "latency_total_ms": round(self._latency_total * 1000, 3),
+                "latency_avg_ms": round(self._latency_total * 1000 / writes, 3) if writes else 0.0,
+                "latency_max_ms": round(self._latency_max * 1000, 3),
+            }
+
+
+# Reads go through a pool of read-only connections, writes through one writer
+_pool = ConnectionPool(readonly=True)
+_writer = DatabaseWriter(
+    window=GROUP_COMMIT_WINDOW_MS / 1000, max_batch=GROUP_COMMIT_MAX_BATCH
+)
+
+
+def pool_stats():
+    return _pool.stats()
+
+
+def writer_stats():
+    return _writer.stats()
+
+
+def _stats_collector(stats, key):
+    return lambda: {(): stats()[key]}
+
+
+for _name, _type, _key, _help in [
+    ("library_db_pool_checkouts_total", "counter", "checkouts", "Connections handed out by get_db_connection."),
+    ("library_db_pool_in_use", "gauge", "in_use", "Pooled read connections checked out."),
+    ("library_db_pool_idle", "gauge", "idle", "Pooled read connections idle."),
+    ("library_db_pool_timeouts_total", "counter", "timeouts", "get_db_connection calls that timed out."),
+]:
+    metrics.add_collector(_name, _help, _type, (), _stats_collector(pool_stats, _key))
+for _name, _type, _key, _help in [
+    ("library_db_writer_queue_depth", "gauge", "queue_depth", "Write jobs waiting for the writer."),
+    ("library_db_writer_jobs_total", "counter", "writes", "Write jobs completed."),
+    ("library_db_writer_errors_total", "counter", "errors", "Write jobs that failed."),
+]:
+    metrics.add_collector(_name, _help, _type, (), _stats_collector(writer_stats, _key))
 
-DATABASE_NAME = "library.db"
 
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row
+    """Check out a pooled read-only connection."""
+    conn = _pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        _pool.release(conn)
 
-def init_db():
-    # Delete the existing database file if it exists
-    if os.path.exists(DATABASE_NAME):
-        os.remove(DATABASE_NAME)
-        
+
+def execute_write(func, *args):
+    """Run ``func(conn, *args)`` on the writer connection, commit, and return its result."""
+    return _writer.submit(func, *args).result()
+
+
+def submit_write(func, *args):
+    """Like execute_write, but return the Future instead of waiting for it."""
+    return _writer.submit(func, *args)
+
+
+@contextmanager
+def bulk_load():
+    """Run the enclosed writes with BULK_LOAD_PRAGMAS on the writer connection."""
+    previous = _writer.set_pragmas(BULK_LOAD_PRAGMAS).result()
+    try:
+        yield
+    finally:
+        _writer.set_pragmas(previous).result()
+
+
+_write_listeners = []
+
+
+def add_write_listener(listener):
+    """Register ``listener(tables)`` to be called after a write to ``tables`` commits."""
+    _write_listeners.append(listener)
+
+
+def notify_write(*tables):
+    """Tell listeners (caches, version counters) that ``tables`` changed."""
+    for listener in list(_write_listeners):
+        listener(tables)
+
+
+def table_versions():
+    """Return ``{table: version}``; a version goes up with every committed row change."""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Create Authors table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS authors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL
-            )
-        ''')
+        return {row[0]: row[1] for row in conn.execute('SELECT name, version FROM table_versions')}
 
-        # Create Genres table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS genres (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE
-            )
-        ''')
-
-        # Create Books table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS books (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                author_id INTEGER,
-                genre_id INTEGER,
-                FOREIGN KEY (author_id) REFERENCES authors(id),
-                FOREIGN KEY (genre_id) REFERENCES genres(id)
-            )
-        ''')
-        
-        conn.commit()
\ No newline at end of file
+
+def close_db():
+    _writer.stop()
+    _pool.close_idle()
+
+# books_view: books with their author and genre names copied in, so
+# listings can skip both joins. Triggers keep it current on every write.
+# It doubles the stored books and adds two lookups per insert, so it only
+# exists while LIBRARY_USE_BOOKS_VIEW is on (see apply_books_view).
+BOOKS_VIEW_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS books_view (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT,
+        author_id INTEGER,
+        genre_id INTEGER,
+        author_name TEXT,
+        genre_name TEXT
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_books_view_author_id ON books_view (author_id)',
+    'CREATE INDEX IF NOT EXISTS idx_books_view_genre_id ON books_view (genre_id)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_book_insert AFTER INSERT ON books BEGIN
+        INSERT OR REPLACE INTO books_view
+        VALUES (
+            new.id, new.title, new.description, new.author_id, new.genre_id,
+            (SELECT name FROM authors WHERE id = new.author_id),
+            (SELECT name FROM genres WHERE id = new.genre_id)
+        );
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_book_update AFTER UPDATE ON books BEGIN
+        DELETE FROM books_view WHERE id = old.id;
+        INSERT OR REPLACE INTO books_view
+        VALUES (
+            new.id, new.title, new.description, new.author_id, new.genre_id,
+            (SELECT name FROM authors WHERE id = new.author_id),
+            (SELECT name FROM genres WHERE id = new.genre_id)
+        );
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_book_delete AFTER DELETE ON books BEGIN
+        DELETE FROM books_view WHERE id = old.id;
+    END
+    ''',
+    # A book may reference an author or genre inserted after it
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_author_insert AFTER INSERT ON authors BEGIN
+        UPDATE books_view SET author_name = new.name WHERE author_id = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_author_update AFTER UPDATE ON authors BEGIN
+        UPDATE books_view SET author_name = NULL WHERE author_id = old.id;
+        UPDATE books_view SET author_name = new.name WHERE author_id = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_author_delete AFTER DELETE ON authors BEGIN
+        UPDATE books_view SET author_name = NULL WHERE author_id = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_genre_insert AFTER INSERT ON genres BEGIN
+        UPDATE books_view SET genre_name = new.name WHERE genre_id = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_genre_update AFTER UPDATE ON genres BEGIN
+        UPDATE books_view SET genre_name = NULL WHERE genre_id = old.id;
+        UPDATE books_view SET genre_name = new.name WHERE genre_id = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_view_genre_delete AFTER DELETE ON genres BEGIN
+        UPDATE books_view SET genre_name = NULL WHERE genre_id = old.id;
+    END
+    ''',
+    '''
+    INSERT OR REPLACE INTO books_view
+    SELECT b.id, b.title, b.description, b.author_id, b.genre_id, a.name, g.name
+    FROM books b
+    LEFT JOIN authors a ON b.author_id = a.id
+    LEFT JOIN genres g ON b.genre_id = g.id
+    ''',
+]
+BOOKS_VIEW_DROP = [
+    'DROP TRIGGER IF EXISTS books_view_book_insert',
+    'DROP TRIGGER IF EXISTS books_view_book_update',
+    'DROP TRIGGER IF EXISTS books_view_book_delete',
+    'DROP TRIGGER IF EXISTS books_view_author_insert',
+    'DROP TRIGGER IF EXISTS books_view_author_update',
+    'DROP TRIGGER IF EXISTS books_view_author_delete',
+    'DROP TRIGGER IF EXISTS books_view_genre_insert',
+    'DROP TRIGGER IF EXISTS books_view_genre_update',
+    'DROP TRIGGER IF EXISTS books_view_genre_delete',
+    # Takes its indexes with it
+    'DROP TABLE IF EXISTS books_view',
+]
+
+# Schema migrations, applied in order. Entry N upgrades user_version N to N+1
+# and must never be edited once released; add a new entry instead.
+MIGRATIONS = [
+    # 1: base tables
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS authors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS genres (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            author_id INTEGER,
+            genre_id INTEGER,
+            FOREIGN KEY (author_id) REFERENCES authors(id),
+            FOREIGN KEY (genre_id) REFERENCES genres(id)
+        )
+        ''',
+    ],
+    # 2: indexes for the author/genre lookups. (author_id, title) also covers
+    # the title-by-author join in get_db_stats; id is the rowid and comes free.
+    [
+        'CREATE INDEX IF NOT EXISTS idx_books_author_title ON books (author_id, title)',
+        'CREATE INDEX IF NOT EXISTS idx_books_genre_id ON books (genre_id)',
+    ],
+    # 3: full-text index over book titles and descriptions, kept in sync by triggers
+    [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, description, content='books', content_rowid='id'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO books_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        ''',
+        # Index the books that already exist
+        "INSERT INTO books_fts (books_fts) VALUES ('rebuild')",
+    ],
+    # 4: per-table write version counters, used for ETags. Kept in the
+    # database (not in memory) so every worker sees every other's writes.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        "INSERT OR IGNORE INTO table_versions (name) VALUES ('authors'), ('genres'), ('books')",
+        '''
+        CREATE TRIGGER IF NOT EXISTS authors_version_insert AFTER INSERT ON authors BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'authors';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS authors_version_update AFTER UPDATE ON authors BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'authors';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS authors_version_delete AFTER DELETE ON authors BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'authors';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS genres_version_insert AFTER INSERT ON genres BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'genres';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS genres_version_update AFTER UPDATE ON genres BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'genres';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS genres_version_delete AFTER DELETE ON genres BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'genres';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_version_insert AFTER INSERT ON books BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'books';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_version_update AFTER UPDATE ON books BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'books';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_version_delete AFTER DELETE ON books BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'books';
+        END
+        ''',
+    ],
+    # 5: books_view and its triggers, backfilled
+    BOOKS_VIEW_SCHEMA,
+    # 6: row counts and per-author/per-genre book counts for /stats,
+    # maintained by triggers so reading them never scans the big tables
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS row_counts (
+            name TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS author_book_counts (
+            author_id INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS genre_book_counts (
+            genre_id INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS authors_count_insert AFTER INSERT ON authors BEGIN
+            UPDATE row_counts SET count = count + 1 WHERE name = 'authors';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS authors_count_delete AFTER DELETE ON authors BEGIN
+            UPDATE row_counts SET count = count - 1 WHERE name = 'authors';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS genres_count_insert AFTER INSERT ON genres BEGIN
+            UPDATE row_counts SET count = count + 1 WHERE name = 'genres';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS genres_count_delete AFTER DELETE ON genres BEGIN
+            UPDATE row_counts SET count = count - 1 WHERE name = 'genres';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_count_insert AFTER INSERT ON books BEGIN
+            UPDATE row_counts SET count = count + 1 WHERE name = 'books';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_count_delete AFTER DELETE ON books BEGIN
+            UPDATE row_counts SET count = count - 1 WHERE name = 'books';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_author_count_insert AFTER INSERT ON books
+            WHEN new.author_id IS NOT NULL
+        BEGIN
+            INSERT INTO author_book_counts (author_id, count) VALUES (new.author_id, 1)
+            ON CONFLICT (author_id) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_author_count_delete AFTER DELETE ON books
+            WHEN old.author_id IS NOT NULL
+        BEGIN
+            UPDATE author_book_counts SET count = count - 1 WHERE author_id = old.author_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_author_count_move_out AFTER UPDATE OF author_id ON books
+            WHEN old.author_id IS NOT NULL
+        BEGIN
+            UPDATE author_book_counts SET count = count - 1 WHERE author_id = old.author_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_author_count_move_in AFTER UPDATE OF author_id ON books
+            WHEN new.author_id IS NOT NULL
+        BEGIN
+            INSERT INTO author_book_counts (author_id, count) VALUES (new.author_id, 1)
+            ON CONFLICT (author_id) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_genre_count_insert AFTER INSERT ON books
+            WHEN new.genre_id IS NOT NULL
+        BEGIN
+            INSERT INTO genre_book_counts (genre_id, count) VALUES (new.genre_id, 1)
+            ON CONFLICT (genre_id) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_genre_count_delete AFTER DELETE ON books
+            WHEN old.genre_id IS NOT NULL
+        BEGIN
+            UPDATE genre_book_counts SET count = count - 1 WHERE genre_id = old.genre_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_genre_count_move_out AFTER UPDATE OF genre_id ON books
+            WHEN old.genre_id IS NOT NULL
+        BEGIN
+            UPDATE genre_book_counts SET count = count - 1 WHERE genre_id = old.genre_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_genre_count_move_in AFTER UPDATE OF genre_id ON books
+            WHEN new.genre_id IS NOT NULL
+        BEGIN
+            INSERT INTO genre_book_counts (genre_id, count) VALUES (new.genre_id, 1)
+            ON CONFLICT (genre_id) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        # Start from the rows that already exist
+        '''
+        INSERT OR REPLACE INTO row_counts (name, count) VALUES
+            ('authors', (SELECT count(*) FROM authors)),
+            ('genres', (SELECT count(*) FROM genres)),
+            ('books', (SELECT count(*) FROM books))
+        ''',
+        '''
+        INSERT OR REPLACE INTO author_book_counts (author_id, count)
+        SELECT author_id, count(*) FROM books WHERE author_id IS NOT NULL GROUP BY author_id
+        ''',
+        '''
+        INSERT OR REPLACE INTO genre_book_counts (genre_id, count)
+        SELECT genre_id, count(*) FROM books WHERE genre_id IS NOT NULL GROUP BY genre_id
+        ''',
+    ],
+    # 7: index books by author_id alone. Nothing joins on title any more,
+    # and with the rowid straight after author_id, an author's books come
+    # back in id order without a sort.
+    [
+        'DROP INDEX IF EXISTS idx_books_author_title',
+        'CREATE INDEX IF NOT EXISTS idx_books_author_id ON books (author_id)',
+    ],
+    # 8: books_view becomes optional; apply_books_view recreates it if enabled
+    BOOKS_VIEW_DROP,
+]
+
+
+def schema_version():
+    with get_db_connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn, from_version=0):
+    """Run every migration after ``from_version`` on ``conn`` without committing."""
+    for statements in MIGRATIONS[from_version:]:
+        for statement in statements:
+            conn.execute(statement)
+    conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+
+def apply_books_view(conn, enabled=None):
+    """Create and backfill books_view if ``enabled``, drop it otherwise.
+
+    ``enabled`` defaults to USE_BOOKS_VIEW. Backfilling copies every book,
+    so turning it on against a large catalog makes that startup slow once.
+    """
+    if enabled is None:
+        enabled = USE_BOOKS_VIEW
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_view'"
+    ).fetchone() is not None
+    if enabled != exists:
+        for statement in BOOKS_VIEW_SCHEMA if enabled else BOOKS_VIEW_DROP:
+            conn.execute(statement)
+
+
+def init_db():
+    """Bring the database schema up to date, keeping existing data.
+
+    Only migrations newer than ``PRAGMA user_version`` run. BEGIN IMMEDIATE
+    takes the write lock first, so several workers starting at once apply
+    each step exactly once.
+    """
+    with closing(_connect()) as conn:
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > len(MIGRATIONS):
+                raise RuntimeError(
+                    f"Database schema version {version} is newer than this code "
+                    f"({len(MIGRATIONS)})"
+                )
+            apply_migrations(conn, version)
+            apply_books_view(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
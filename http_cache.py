@@ -0,0 +1,334 @@
+# http_cache.py
+"""Response cache and ETags for the read endpoints.
+
+Fully serialized GET responses are stored by path and query string, with
+LRU eviction against a byte budget and a TTL per route. Each route lists
+the tables its response is built from; when crud commits a write to one
+of them (database.notify_write), every entry depending on it is dropped.
+A response computed while such a write landed is not stored, so a slow
+read cannot put stale bytes back after the invalidation.
+
+That invalidation is per process, so each entry also records the
+database's per-table version counters it was built under. The counters
+are read once per request (one pooled read, also on a hit) and a
+mismatch is a miss, which covers writes made by other workers and by
+background loads that bypass notify_write.
+
+ETags come from the same counters, which every worker shares, so a
+matching If-None-Match is answered with 304 before the route runs.
+Routes answered from in-memory indexes can lag the database, so theirs
+is a hash of the body actually sent and they never touch the database.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from async_crud import run_in_db_thread
+from database import add_write_listener, table_versions
+
+CACHE_ENABLED = os.environ.get("LIBRARY_CACHE_ENABLED", "1") == "1"
+CACHE_MAX_BYTES = int(os.environ.get("LIBRARY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+BOOK_TABLES = ("books", "authors", "genres")
+
+# (path pattern, TTL in seconds or None for ETag only, tables the response
+# reads or None when its ETag is a hash of the body)
+ROUTES = [
+    (re.compile(r"^/books/search$"), 30, BOOK_TABLES),
+    (re.compile(r"^/books/(batch|\d+)?$"), 60, BOOK_TABLES),
+    (re.compile(r"^/authors/(batch|\d+)?$"), 60, ("authors", "books")),
+    (re.compile(r"^/genres/(batch|\d+)?$"), 300, ("genres",)),
+    (re.compile(r"^/genres/\d+/books$"), 60, BOOK_TABLES),
+    # Served from in-memory indexes, so only revalidation applies
+    (re.compile(r"^/authors/search$"), None, None),
+    (re.compile(r"^/autocomplete$"), None, None),
+]
+
+
+def match_route(path):
+    """Return ``(ttl, tables)`` for a cacheable path, or None."""
+    for pattern, ttl, tables in ROUTES:
+        if pattern.match(path):
+            return ttl, tables
+    return None
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (expires_at, status, headers, body, tables, size, versions)
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._generations = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key, versions):
+        """Return ``(status, headers, body)`` if cached under these table ``versions``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] <= time.monotonic() or entry[6] != versions):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1], entry[2], entry[3]
+
+    def generation(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def put(self, key, ttl, tables, generation, versions, status, headers, body):
+        size = len(body) + sum(len(name) + len(value) for name, value in headers)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # A write committed while this response was being built
+            if generation != tuple(self._generations.get(table, 0) for table in tables):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, status, headers, body, tables, size, versions)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in self._by_table.pop(table, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[5]
+        for table in entry[4]:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": CACHE_ENABLED,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+cache = ResponseCache()
+add_write_listener(cache.invalidate)
+
+for _key, _type, _help in [
+    ("hits", "counter", "Responses served from the cache."),
+    ("misses", "counter", "Cacheable requests not in the cache."),
+    ("evictions", "counter", "Entries evicted for space."),
+    ("invalidations", "counter", "Entries dropped by writes."),
+    ("entries", "gauge", "Entries in the cache."),
+    ("bytes", "gauge", "Bytes held by the cache."),
+]:
+    _name = f"library_cache_{_key}" + ("_total" if _type == "counter" else "")
+    metrics.add_collector(_name, _help, _type, (), lambda key=_key: {(): cache.stats()[key]})
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving cacheable GETs from ``cache``."""
+
+    def __init__(self, app, cache=cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if not CACHE_ENABLED or scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        route = match_route(scope["path"])
+        if route is None or route[0] is None:
+            await self.app(scope, receive, send)
+            return
+
+        ttl, tables = route
+        key = _request_key(scope)
+        current = await request_versions(scope)
+        versions = tuple(current.get(table, 0) for table in tables)
+        cached = self.cache.get(key, versions)
+        if cached is not None:
+            status, headers, body = cached
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers + [(b"x-cache", b"HIT")],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        generation = self.cache.generation(tables)
+        start = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-cache", b"MISS")])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False) and start.get("status") == 200:
+                    self.cache.put(
+                        key, ttl, tables, generation, versions, start["status"],
+                        list(start.get("headers", [])), b"".join(chunks),
+                    )
+            await send(message)
+
+        await self.app(scope, receive, capture)
+
+
+def _request_key(scope):
+    return scope["path"] + "?" + scope["query_string"].decode("latin-1")
+
+
+async def request_versions(scope):
+    """Return the table versions for this request, read once and kept in ``scope``.
+
+    Read before the response is built, so a concurrent write can only make
+    them older than the body, never newer.
+    """
+    versions = scope.get("library.table_versions")
+    if versions is None:
+        versions = scope["library.table_versions"] = await run_in_db_thread(table_versions)
+    return versions
+
+
+def make_etag(key, tables, versions):
+    state = key + "|" + ",".join(f"{table}={versions.get(table, 0)}" for table in tables)
+    return '"' + hashlib.sha1(state.encode()).hexdigest() + '"'
+
+
+def body_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match, etag, wildcard=True):
+    """``wildcard`` lets ``*`` match; only safe once the resource is known to exist."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (wildcard and candidate == "*") or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def _send_not_modified(send, encoded):
+    await send({
+        "type": "http.response.start",
+        "status": 304,
+        "headers": [(b"etag", encoded)],
+    })
+    await send({"type": "http.response.body", "body": b""})
+
+
+class ETagMiddleware:
+    """Add a strong ETag to cacheable GETs and answer If-None-Match with 304."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        route = match_route(scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+                break
+
+        if route[1] is None:
+            await self._tag_body(scope, receive, send, if_none_match)
+            return
+
+        versions = await request_versions(scope)
+        etag = make_etag(_request_key(scope), route[1], versions)
+        encoded = etag.encode()
+        # "*" waits for the route: a missing resource must still get its 404
+        if if_none_match is not None and _etag_matches(if_none_match, etag, wildcard=False):
+            await _send_not_modified(send, encoded)
+            return
+        not_modified = False
+
+        async def tag(message):
+            nonlocal not_modified
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                if if_none_match is not None and _etag_matches(if_none_match, etag):
+                    not_modified = True
+                    await _send_not_modified(send, encoded)
+                    return
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"etag", encoded)])
+            elif not_modified:
+                # The body of the 200 that became a 304
+                return
+            await send(message)
+
+        await self.app(scope, receive, tag)
+
+    async def _tag_body(self, scope, receive, send, if_none_match):
+        """Run the route, then tag its buffered body by hash; 304 if it matches."""
+        start = {}
+        chunks = []
+
+        async def buffer(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            headers = list(start.get("headers", []))
+            if start["status"] == 200:
+                etag = body_etag(body)
+                encoded = etag.encode()
+                if if_none_match is not None and _etag_matches(if_none_match, etag):
+                    await _send_not_modified(send, encoded)
+                    return
+                headers.append((b"etag", encoded))
+            await send(dict(start, headers=headers))
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffer)
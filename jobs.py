@@ -0,0 +1,176 @@
+# jobs.py
+"""Background jobs for long admin work such as seeding.
+
+A job is ``func(job, *args)`` run on a small dedicated thread pool, so
+neither the event loop nor the DB executor used by requests is tied up.
+The function reports progress with ``job.progress(...)``, which is also
+where cancellation is noticed and where the job is throttled: after each
+step it sleeps long enough that it only runs ``JOB_DUTY_CYCLE`` of the
+time, leaving the GIL and the writer to foreground requests.
+
+Jobs are tracked per process, like the response cache.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.environ.get("LIBRARY_JOB_WORKERS", "1"))
+# Fraction of wall time a job may spend working between progress calls
+JOB_DUTY_CYCLE = float(os.environ.get("LIBRARY_JOB_DUTY_CYCLE", "0.5"))
+# Rows per write transaction in background loads; each one holds up
+# foreground writes queued behind it, so keep it to tens of milliseconds
+JOB_TRANSACTION_ROWS = int(os.environ.get("LIBRARY_JOB_TRANSACTION_ROWS", "2000"))
+# Finished jobs kept for GET /jobs/{id}
+JOB_HISTORY = int(os.environ.get("LIBRARY_JOB_HISTORY", "100"))
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by ``progress`` once cancellation was requested."""
+
+
+class Job:
+    def __init__(self, job_id, kind, duty_cycle=JOB_DUTY_CYCLE):
+        self.id = job_id
+        self.kind = kind
+        self.duty_cycle = duty_cycle
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._status = PENDING
+        self._progress = {}
+        self._result = None
+        self._error = None
+        self._created_at = time.time()
+        self._started_at = None
+        self._finished_at = None
+        self._throttled = 0.0
+        self._step_started = None
+        # Bumped on every change so watchers can tell when to send an update
+        self.version = 0
+
+    @property
+    def finished(self):
+        return self._status in FINISHED
+
+    def cancel(self):
+        """Ask the job to stop at its next progress call."""
+        self._cancel.set()
+        with self._lock:
+            if self._status == PENDING:
+                self._finish(CANCELLED)
+
+    def progress(self, **fields):
+        """Record progress, then throttle and raise JobCancelled if cancelled."""
+        with self._lock:
+            self._progress.update(fields)
+            self.version += 1
+        if self._cancel.is_set():
+            raise JobCancelled()
+        worked = time.perf_counter() - self._step_started
+        if 0 < self.duty_cycle < 1:
+            pause = worked * (1 - self.duty_cycle) / self.duty_cycle
+            # wait() rather than sleep() so a cancel cuts the pause short
+            if self._cancel.wait(pause):
+                raise JobCancelled()
+            with self._lock:
+                self._throttled += pause
+        self._step_started = time.perf_counter()
+
+    def run(self, func, args):
+        with self._lock:
+            if self._status != PENDING:
+                return
+            self._status = RUNNING
+            self._started_at = time.time()
+            self.version += 1
+        self._step_started = time.perf_counter()
+        try:
+            result = func(self, *args)
+        except JobCancelled:
+            with self._lock:
+                self._finish(CANCELLED)
+        except Exception as exc:
+            with self._lock:
+                self._error = f"{type(exc).__name__}: {exc}"
+                self._finish(FAILED)
+        else:
+            with self._lock:
+                self._result = result
+                self._finish(SUCCEEDED)
+
+    def _finish(self, status):
+        self._status = status
+        self._finished_at = time.time()
+        self.version += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self._status,
+                "progress": dict(self._progress),
+                "result": self._result,
+                "error": self._error,
+                "created_at": self._created_at,
+                "started_at": self._started_at,
+                "finished_at": self._finished_at,
+                "throttled_seconds": round(self._throttled, 3),
+            }
+
+
+class JobManager:
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.workers = workers
+        self.history = history
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._executor = None
+
+    def submit(self, kind, func, *args):
+        """Queue ``func(job, *args)`` and return its Job straight away."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            job = Job(str(next(self._ids)), kind)
+            self._jobs[job.id] = job
+            self._prune()
+            self._executor.submit(job.run, func, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.snapshot() for job in jobs]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        """Cancel every job and wait for the running ones to stop."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+manager = JobManager()
@@ -1,95 +1,327 @@
-from fastapi import FastAPI, HTTPException
-from typing import List
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import asyncio
+import json
 import socket
 import sys
 
 from models import (
-    BookCreate, BookResponse,
-    AuthorCreate, AuthorResponse,
-    GenreCreate, GenreResponse
+    BookCreate, BookResponse, BookBatchResponse, BookSearchResult,
+    AuthorCreate, AuthorResponse, AuthorBatchResponse, AuthorMatch,
+    GenreCreate, GenreResponse, GenreBatchResponse,
+    AutocompleteSuggestion
 )
-from crud import (
-    create_book, get_books, get_book,
-    create_author, get_authors, get_author,
-    create_genre, get_genres, get_genre,
-    get_books_by_genre
+from async_crud import (
+    run_in_db_thread, shutdown as shutdown_db_executor,
+    create_book, get_books, get_book, get_books_by_ids,
+    create_author, get_authors, get_author, get_authors_by_ids,
+    get_author_json, get_authors_json,
+    create_genre, get_genres, get_genre, get_genres_by_ids,
+    get_books_by_genre, search_books
 )
-from database import init_db
-from seeder import seed_database, get_db_stats
+import autocomplete
+import rendering
+import http_cache
+import fuzzy
+import jobs
+import metrics
+import query_budget
+from pagination import (
+    encode_cursor, decode_cursor, next_cursor, encode_search_cursor, decode_search_cursor
+)
+from database import init_db, close_db, pool_stats, writer_stats, profile_settings
+from seeder import seed_database, get_db_stats, STATS_LISTINGS, DEFAULT_SEED
 
 app = FastAPI()
+app.add_middleware(http_cache.ResponseCacheMiddleware)
+# Added last so it runs first: a 304 skips the cache lookup as well
+app.add_middleware(http_cache.ETagMiddleware)
+# Counts the ETag version lookup too, and adds X-DB-Queries / X-DB-Time
+app.add_middleware(query_budget.QueryBudgetMiddleware)
+# Outermost, so cache hits and 304s are measured too
+app.add_middleware(metrics.MetricsMiddleware, routes=app.routes)
+
+MAX_BATCH_IDS = 100
+# How often the job event stream checks for progress
+JOB_EVENTS_INTERVAL = 0.5
 
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    # Full scans of books and authors: about 2 s per index at 1M books and
+    # 50k authors, most of a restart at that size.
+    await run_in_db_thread(autocomplete.build_index)
+    await run_in_db_thread(fuzzy.build_index)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Jobs still need the writer, so stop them first
+    jobs.manager.shutdown()
+    shutdown_db_executor()
+    close_db()
+
+def _seed_job(job, authors, genres, books, seed):
+    def progress(table, done, total):
+        job.progress(stage=table, done=done, total=total)
+    try:
+        # Small transactions so foreground writes never queue long behind the
+        # load, and no bulk-load PRAGMAs: they would also cover those writes
+        return seed_database(authors, genres, books, seed, progress=progress,
+                             chunk_size=jobs.JOB_TRANSACTION_ROWS, chunks_per_transaction=1,
+                             bulk=False)
+    finally:
+        # Seeding bypasses crud, so rebuild the in-memory indexes from the
+        # tables, also after a cancel since committed rows stay
+        autocomplete.build_index()
+        fuzzy.build_index()
+
+@app.get("/seed", status_code=202)
+async def seed_data(
+    response: Response,
+    authors: Optional[int] = Query(None, ge=0),
+    genres: Optional[int] = Query(None, ge=0),
+    books: Optional[int] = Query(None, ge=0),
+    seed: int = DEFAULT_SEED,
+):
+    """Endpoint to trigger database seeding
 
-@app.get("/seed")
-async def seed_data():
-    """Endpoint to trigger database seeding"""
-    stats = seed_database()
+    Without counts this loads the sample catalog; with them a synthetic one.
+    Seeding runs as a background job; poll the returned job for the result.
+    """
+    job = jobs.manager.submit("seed", _seed_job, authors, genres, books, seed)
+    response.headers["Location"] = f"/jobs/{job.id}"
     return {
-        "message": "Database seeded successfully",
-        "data": stats
+        "message": "Database seeding started",
+        "job": job.snapshot()
     }
 
+def _get_job(job_id: str):
+    job = jobs.manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs")
+async def get_jobs_list():
+    return jobs.manager.list()
+
+@app.get("/jobs/{job_id}")
+async def get_job_by_id(job_id: str):
+    return _get_job(job_id).snapshot()
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events: the job's state on every change until it finishes."""
+    job = _get_job(job_id)
+
+    async def events():
+        sent = None
+        while True:
+            version = job.version
+            if version != sent:
+                sent = version
+                snapshot = job.snapshot()
+                yield f"id: {version}\ndata: {json.dumps(snapshot)}\n\n"
+                if snapshot["status"] in jobs.FINISHED:
+                    return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.delete("/jobs/{job_id}", status_code=202)
+async def cancel_job(job_id: str):
+    """Request cancellation; the job stops at its next progress step."""
+    job = _get_job(job_id)
+    job.cancel()
+    return job.snapshot()
+
 @app.get("/stats")
-async def get_stats():
-    """Get current database statistics"""
-    return get_db_stats()
+async def get_stats(response: Response, include: str = "",
+                    limit: int = Query(100, ge=1, le=1000), after: Optional[str] = None):
+    """Get current database statistics.
 
-@app.on_event("startup")
-async def startup_event():
-    init_db()
+    ``include`` is a comma-separated subset of authors,genres,books to also
+    list, one page of ``limit`` rows each; X-Next-Cursor pages through them.
+    """
+    listings = [name for name in include.split(",") if name]
+    unknown = set(listings) - set(STATS_LISTINGS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown listing(s): {', '.join(sorted(unknown))}")
+    stats = await run_in_db_thread(get_db_stats, listings, limit, _decode_after(after))
+    # Listings are id-ordered; resuming from the smallest last id of the
+    # full pages repeats some rows but never skips one
+    last_ids = [stats[name][-1]["id"] for name in listings if next_cursor(stats[name], limit)]
+    if last_ids:
+        response.headers["X-Next-Cursor"] = encode_cursor(min(last_ids))
+    stats["pool"] = pool_stats()
+    stats["writer"] = writer_stats()
+    stats["profile"] = profile_settings()
+    stats["cache"] = http_cache.cache.stats()
+    return stats
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text-format metrics."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+def _decode_after(after: Optional[str]) -> int:
+    """Turn the ``after`` query parameter into the last-seen id (0 = first page)."""
+    if after is None:
+        return 0
+    try:
+        return decode_cursor(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _set_next_cursor(response: Response, rows, limit: int):
+    cursor = next_cursor(rows, limit)
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+
+def _parse_ids(ids: str) -> List[int]:
+    """Parse a comma-separated id list, dropping duplicates but keeping order."""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
+def _batch_result(ids: List[int], rows):
+    found = {row["id"] for row in rows}
+    return {"items": rows, "missing": [item_id for item_id in ids if item_id not in found]}
+
+@app.get("/autocomplete", response_model=List[AutocompleteSuggestion])
+async def autocomplete_titles_and_authors(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    type: Optional[str] = Query(None, pattern="^(book|author)$"),
+):
+    # Served from memory; no database round trip
+    return autocomplete.index.lookup(prefix, limit=limit, kind=type)
 
 @app.post("/genres/", response_model=GenreResponse)
 async def create_new_genre(genre: GenreCreate):
-    return create_genre(genre)
+    return await create_genre(genre)
 
 @app.get("/genres/", response_model=List[GenreResponse])
-async def get_genres_list(skip: int = 0, limit: int = 10):
-    return get_genres(skip=skip, limit=limit)
+async def get_genres_list(response: Response, skip: int = 0, limit: int = 10,
+                          after: Optional[str] = None):
+    genres = await get_genres(skip=skip, limit=limit, after=_decode_after(after))
+    _set_next_cursor(response, genres, limit)
+    return rendering.respond(GenreResponse, genres, response, many=True)
+
+@app.get("/genres/batch", response_model=GenreBatchResponse)
+async def get_genres_batch(ids: str = Query(..., description="Comma-separated genre ids")):
+    genre_ids = _parse_ids(ids)
+    result = _batch_result(genre_ids, await get_genres_by_ids(genre_ids))
+    return rendering.respond(GenreBatchResponse, result)
 
 @app.get("/genres/{genre_id}", response_model=GenreResponse)
 async def get_genre_by_id(genre_id: int):
-    genre = get_genre(genre_id)
+    genre = await get_genre(genre_id)
     if genre is None:
         raise HTTPException(status_code=404, detail="Genre not found")
-    return genre
+    return rendering.respond(GenreResponse, genre)
 
 @app.get("/genres/{genre_id}/books", response_model=List[BookResponse])
-async def get_books_by_genre_id(genre_id: int, skip: int = 0, limit: int = 10):
-    return get_books_by_genre(genre_id, skip=skip, limit=limit)
+async def get_books_by_genre_id(genre_id: int, response: Response, skip: int = 0,
+                                limit: int = 10, after: Optional[str] = None):
+    books = await get_books_by_genre(genre_id, skip=skip, limit=limit,
+                                     after=_decode_after(after))
+    _set_next_cursor(response, books, limit)
+    return rendering.respond(BookResponse, books, response, many=True)
 
 
 @app.post("/books/", response_model=BookResponse)
 async def create_new_book(book: BookCreate):
-    return create_book(book)
+    return await create_book(book)
 
 @app.get("/books/", response_model=List[BookResponse])
-async def get_books_list(skip: int = 0, limit: int = 10):
-    return get_books(skip=skip, limit=limit)
+async def get_books_list(response: Response, skip: int = 0, limit: int = 10,
+                         after: Optional[str] = None):
+    books = await get_books(skip=skip, limit=limit, after=_decode_after(after))
+    _set_next_cursor(response, books, limit)
+    return rendering.respond(BookResponse, books, response, many=True)
+
+@app.get("/books/batch", response_model=BookBatchResponse)
+async def get_books_batch(ids: str = Query(..., description="Comma-separated book ids")):
+    book_ids = _parse_ids(ids)
+    result = _batch_result(book_ids, await get_books_by_ids(book_ids))
+    return rendering.respond(BookBatchResponse, result)
+
+@app.get("/books/search", response_model=List[BookSearchResult])
+async def search_books_list(response: Response, q: str = Query(..., min_length=1),
+                            limit: int = Query(10, ge=1, le=100), after: Optional[str] = None):
+    after_rank, after_id = None, 0
+    if after is not None:
+        try:
+            after_rank, after_id = decode_search_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    books = await search_books(q, limit=limit, after_rank=after_rank, after_id=after_id)
+    for book in books:
+        # bm25() is lower-is-better; flip it so a higher score means a better match
+        book["score"] = -book["rank"]
+    if len(books) >= limit:
+        response.headers["X-Next-Cursor"] = encode_search_cursor(books[-1]["rank"], books[-1]["id"])
+    return rendering.respond(BookSearchResult, books, response, many=True)
 
 @app.get("/books/{book_id}", response_model=BookResponse)
 async def get_book_by_id(book_id: int):
-    book = get_book(book_id)
+    book = await get_book(book_id)
     if book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book
+    return rendering.respond(BookResponse, book)
 
 @app.post("/authors/", response_model=AuthorResponse)
 async def create_new_author(author: AuthorCreate):
-    return create_author(author)
+    return await create_author(author)
 
 @app.get("/authors/", response_model=List[AuthorResponse])
-async def get_authors_list(skip: int = 0, limit: int = 10):
-    return get_authors(skip=skip, limit=limit)
+async def get_authors_list(response: Response, skip: int = 0, limit: int = 10,
+                           after: Optional[str] = None):
+    if rendering.RENDER_MODE == "sql":
+        document, last_id, count = await get_authors_json(
+            skip=skip, limit=limit, after=_decode_after(after))
+        if limit > 0 and count >= limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(last_id)
+        return rendering.respond_raw(document, response)
+    authors = await get_authors(skip=skip, limit=limit, after=_decode_after(after))
+    _set_next_cursor(response, authors, limit)
+    return rendering.respond(AuthorResponse, authors, response, many=True)
+
+@app.get("/authors/batch", response_model=AuthorBatchResponse)
+async def get_authors_batch(ids: str = Query(..., description="Comma-separated author ids")):
+    author_ids = _parse_ids(ids)
+    result = _batch_result(author_ids, await get_authors_by_ids(author_ids))
+    return rendering.respond(AuthorBatchResponse, result)
+
+@app.get("/authors/search", response_model=List[AuthorMatch])
+async def search_authors_fuzzy(
+    name: str = Query(..., min_length=1),
+    max_distance: int = Query(2, ge=0, le=4),
+    limit: int = Query(5, ge=1, le=50),
+):
+    # Tree walks are CPU-bound, keep them off the event loop
+    return await run_in_db_thread(fuzzy.authors.search, name, max_distance, limit)
 
 @app.get("/authors/{author_id}", response_model=AuthorResponse)
 async def get_author_by_id(author_id: int):
-    author = get_author(author_id)
+    if rendering.RENDER_MODE == "sql":
+        document = await get_author_json(author_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Author not found")
+        return rendering.respond_raw(document)
+    author = await get_author(author_id)
     if author is None:
         raise HTTPException(status_code=404, detail="Author not found")
-    return author
+    return rendering.respond(AuthorResponse, author)
 
 
 def find_free_port(start_port: int = 8000, max_attempts: int = 100) -> int:
@@ -0,0 +1,241 @@
+# metrics.py
+"""Prometheus text-format metrics for requests, SQLite and the caches.
+
+Instruments are plain in-process counters, gauges and histograms: one
+lock and a dict update per observation, so they stay on in production.
+Modules record into the instruments defined at the bottom of this file;
+numbers other modules already keep (pool, writer, response cache) are
+read only when /metrics is scraped, through ``add_collector``.
+
+Set ``LIBRARY_METRICS_ENABLED=0`` to skip the per-request and per-query
+instrumentation entirely.
+"""
+import bisect
+import functools
+import os
+import re
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get("LIBRARY_METRICS_ENABLED", "1") == "1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Statements beyond this many distinct shapes share one "other" series
+MAX_STATEMENTS = 500
+# Longer statements (migrations, mostly) are cut down in labels
+MAX_STATEMENT_LENGTH = 200
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMIT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+_registry = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name, self.labels, labels, value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values = {}
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        names = self.labels + ("le",)
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket", names, labels + (_format_value(bound),), cumulative
+            yield self.name + "_sum", self.labels, labels, total
+            yield self.name + "_count", self.labels, labels, cumulative
+
+
+def add_collector(name, help, type, labels, collect):
+    """Register ``collect()`` -> ``{label values: value}``, called at scrape time."""
+    _collectors.append((name, help, type, tuple(labels), collect))
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+
+    def family(name, help, type, samples):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {type}")
+        for sample_name, names, values, value in samples:
+            lines.append(f"{sample_name}{_format_labels(names, values)} {_format_value(value)}")
+
+    for metric in _registry:
+        family(metric.name, metric.help, metric.type, metric.samples())
+    for name, help, type, labels, collect in _collectors:
+        family(name, help, type, (
+            (name, labels, values if isinstance(values, tuple) else (values,), value)
+            for values, value in collect().items()
+        ))
+    return "\n".join(lines) + "\n"
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_statement(sql):
+    """Collapse whitespace and replace inline literals with ``?``."""
+    statement = _LITERALS.sub("?", " ".join(sql.split()))
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        statement = statement[:MAX_STATEMENT_LENGTH - 3] + "..."
+    return statement
+
+
+_statements = set()
+_statements_lock = threading.Lock()
+
+
+def _statement_label(sql):
+    statement = normalize_statement(sql)
+    if statement in _statements:
+        return statement
+    with _statements_lock:
+        if len(_statements) >= MAX_STATEMENTS:
+            return "other"
+        _statements.add(statement)
+    return statement
+
+
+def observe_query(sql, seconds, count=1):
+    """Record ``seconds`` spent on ``sql``; ``count=0`` adds time to an earlier execute."""
+    statement = _statement_label(sql)
+    if count:
+        DB_QUERIES.inc(statement, amount=count)
+    DB_QUERY_SECONDS.inc(statement, amount=seconds)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per route.
+
+    Requests are labelled with the route template (``/books/{book_id}``),
+    matched here before the app runs so the in-flight gauge can use it.
+    """
+
+    def __init__(self, app, routes=()):
+        self.app = app
+        # The app's live route list, so routes added after this still count
+        self.routes = routes
+
+    def _route(self, scope):
+        path, method = scope["path"], scope["method"]
+        for route in self.routes:
+            regex = getattr(route, "path_regex", None)
+            if regex is not None and regex.match(path):
+                methods = getattr(route, "methods", None)
+                if methods is None or method in methods:
+                    return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if not METRICS_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route, method = self._route(scope), scope["method"]
+        status = 500
+        HTTP_IN_FLIGHT.inc(route)
+        started = time.perf_counter()
+
+        async def record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, record_status)
+        finally:
+            HTTP_IN_FLIGHT.dec(route)
+            HTTP_DURATION.observe(time.perf_counter() - started, route, method)
+            HTTP_REQUESTS.inc(route, method, str(status))
+
+
+HTTP_REQUESTS = Counter(
+    "library_http_requests_total", "HTTP requests by route, method and status.",
+    ("route", "method", "status"))
+HTTP_DURATION = Histogram(
+    "library_http_request_duration_seconds", "HTTP request latency by route.",
+    ("route", "method"))
+HTTP_IN_FLIGHT = Gauge(
+    "library_http_requests_in_flight", "HTTP requests currently being served.", ("route",))
+DB_QUERIES = Counter(
+    "library_db_queries_total", "SQLite statements executed, by normalized statement.",
+    ("statement",))
+DB_QUERY_SECONDS = Counter(
+    "library_db_query_seconds_total", "Time spent executing and fetching, by normalized statement.",
+    ("statement",))
+DB_COMMITS = Histogram(
+    "library_db_commit_duration_seconds", "Writer COMMIT latency.", buckets=COMMIT_BUCKETS)
+DB_CONNECTIONS_OPENED = Counter(
+    "library_db_connections_opened_total", "SQLite connections opened.", ("kind",))
+DB_CONNECTIONS_CLOSED = Counter(
+    "library_db_connections_closed_total", "SQLite connections closed.", ("kind",))
@@ -1,6 +1,6 @@
 # models.py
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 class BookCreate(BaseModel):
     title: str
@@ -15,6 +15,14 @@ class BookResponse(BaseModel):
     author_id: int
     genre_id: int
 
+class BookSearchResult(BookResponse):
+    snippet: str
+    score: float
+
+class BookBatchResponse(BaseModel):
+    items: List[BookResponse]
+    missing: List[int] = []
+
 class AuthorCreate(BaseModel):
     name: str
 
@@ -23,9 +31,27 @@ class AuthorResponse(BaseModel):
     name: str
     books: List[BookResponse] = []
 
+class AuthorBatchResponse(BaseModel):
+    items: List[AuthorResponse]
+    missing: List[int] = []
+
+class AuthorMatch(BaseModel):
+    id: int
+    name: str
+    distance: int
+
 class GenreCreate(BaseModel):
     name: str
 
 class GenreResponse(BaseModel):
     id: int
-    name: str
\ No newline at end of file
+    name: str
+
+class GenreBatchResponse(BaseModel):
+    items: List[GenreResponse]
+    missing: List[int] = []
+
+class AutocompleteSuggestion(BaseModel):
+    type: Literal["book", "author"]
+    id: int
+    text: str
\ No newline at end of file
@@ -0,0 +1,62 @@
+# pagination.py
+"""Opaque keyset cursors for the list endpoints.
+
+A cursor wraps the primary key of the last row on a page, so the next
+page is a ``WHERE id > ?`` range seek instead of an OFFSET walk.
+"""
+import base64
+import binascii
+import json
+
+
+def _encode(payload) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode(token: str, key: str):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return json.loads(raw)[key]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def encode_cursor(last_id: int) -> str:
+    return _encode({"after": last_id})
+
+
+def decode_cursor(token: str) -> int:
+    """Return the id encoded in ``token``; raises ValueError if it is malformed."""
+    last_id = _decode(token, "after")
+    if not _is_int(last_id):
+        raise ValueError("Invalid cursor")
+    return last_id
+
+
+def encode_search_cursor(rank: float, last_id: int) -> str:
+    # Search results are ordered by (rank, id), so the cursor carries both
+    return _encode({"rank": [rank, last_id]})
+
+
+def decode_search_cursor(token: str):
+    """Return ``(rank, last_id)`` from a search cursor; raises ValueError if malformed."""
+    value = _decode(token, "rank")
+    if (
+        not isinstance(value, list) or len(value) != 2
+        or not isinstance(value[0], (int, float)) or isinstance(value[0], bool)
+        or not _is_int(value[1])
+    ):
+        raise ValueError("Invalid cursor")
+    return float(value[0]), value[1]
+
+
+def next_cursor(rows, limit: int):
+    """Cursor for the page after ``rows``, or None when this was the last page."""
+    if limit > 0 and len(rows) >= limit:
+        return encode_cursor(rows[-1]["id"])
+    return None
@@ -0,0 +1,161 @@
+# query_budget.py
+"""Per-request SQL statement counts, query budgets and N+1 detection.
+
+The instrumented cursors in database report every execute/executemany
+call through ``observe``. While a request is being served,
+QueryBudgetMiddleware keeps a RequestQueries in a contextvar;
+run_in_db_thread and the writer queue carry contextvars along, so
+statements run on their threads are counted for the request that caused
+them. Work SQLite does on a statement's behalf (triggers, FTS5 shadow
+tables) is part of that statement, and pool housekeeping runs under
+``paused()``. The counts and DB time go out as ``X-DB-Queries`` and
+``X-DB-Time`` (milliseconds) response headers.
+
+A request that runs more statements than its route's budget, or the
+same statement shape more than ``N_PLUS_ONE_THRESHOLD`` times (a query
+per row of an earlier result), is logged. With
+``LIBRARY_QUERY_BUDGET_MODE=raise`` it raises QueryBudgetExceeded
+instead, so a test hitting the route fails. ``off`` disables counting.
+"""
+import contextvars
+import contextlib
+import logging
+import os
+import threading
+
+from metrics import normalize_statement
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_MODES = ("log", "raise", "off")
+QUERY_BUDGET_MODE = os.environ.get("LIBRARY_QUERY_BUDGET_MODE", "log")
+if QUERY_BUDGET_MODE not in QUERY_BUDGET_MODES:
+    raise ValueError(
+        f"Unknown LIBRARY_QUERY_BUDGET_MODE {QUERY_BUDGET_MODE!r}, expected one of {QUERY_BUDGET_MODES}"
+    )
+ENABLED = QUERY_BUDGET_MODE != "off"
+
+DEFAULT_BUDGET = int(os.environ.get("LIBRARY_QUERY_BUDGET", "10"))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("LIBRARY_N_PLUS_ONE_THRESHOLD", "5"))
+
+# "METHOD route template" -> most statements one request may run (None =
+# no limit). Read routes are a fixed handful of queries whatever the page
+# size; the ETag version lookup counts as one of them.
+BUDGETS = {
+    "GET /books/": 3,
+    "GET /books/{book_id}": 3,
+    "GET /books/batch": 3,
+    "GET /books/search": 3,
+    "GET /authors/": 4,
+    "GET /authors/{author_id}": 3,
+    "GET /authors/batch": 4,
+    "GET /genres/": 3,
+    "GET /genres/{genre_id}": 3,
+    "GET /genres/batch": 3,
+    "GET /genres/{genre_id}/books": 3,
+    "GET /stats": 5,
+    "POST /books/": 3,
+    "POST /authors/": 3,
+    "POST /genres/": 3,
+}
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in ``raise`` mode when a request breaks its query budget."""
+
+
+class RequestQueries:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+        # Raw statement text -> times run; normalized only when checked
+        self.statements = {}
+
+    def add(self, sql):
+        with self._lock:
+            self.count += 1
+            self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    def add_time(self, seconds):
+        with self._lock:
+            self.seconds += seconds
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Return ``{statement shape: runs}`` for shapes run more than ``threshold`` times."""
+        with self._lock:
+            statements = list(self.statements.items())
+        shapes = {}
+        for sql, runs in statements:
+            shape = normalize_statement(sql)
+            shapes[shape] = shapes.get(shape, 0) + runs
+        return {shape: runs for shape, runs in shapes.items() if runs > threshold}
+
+    def problems(self, budget):
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f"{self.count} statements, budget is {budget}")
+        for shape, runs in self.repeated().items():
+            problems.append(f"possible N+1: {runs}x {shape}")
+        return problems
+
+
+_current = contextvars.ContextVar("request_queries", default=None)
+
+
+def observe(sql, seconds, count=1):
+    """Record ``seconds`` spent on ``sql``; ``count=0`` adds time to an earlier execute."""
+    queries = _current.get()
+    if queries is not None:
+        if count:
+            queries.add(sql)
+        queries.add_time(seconds)
+
+
+@contextlib.contextmanager
+def paused():
+    """Leave statements run in the block out of the current request's count."""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def budget_for(method, route):
+    return BUDGETS.get(f"{method} {route}", DEFAULT_BUDGET)
+
+
+class QueryBudgetMiddleware:
+    """Count the statements each request runs and check them against its budget."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries()
+        token = _current.set(queries)
+
+        async def report(message):
+            if message["type"] == "http.response.start":
+                # Set by the router; missing when a middleware answered itself
+                route = getattr(scope.get("route"), "path", scope["path"])
+                problems = queries.problems(budget_for(scope["method"], route))
+                if problems:
+                    text = f"{scope['method']} {route}: " + "; ".join(problems)
+                    if QUERY_BUDGET_MODE == "raise":
+                        raise QueryBudgetExceeded(text)
+                    logger.warning("Query budget exceeded: %s", text)
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-db-queries", str(queries.count).encode()),
+                    (b"x-db-time", f"{queries.seconds * 1000:.3f}".encode()),
+                ])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, report)
+        finally:
+            _current.reset(token)
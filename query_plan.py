@@ -0,0 +1,115 @@
+# query_plan.py
+"""Run EXPLAIN QUERY PLAN over every SQL statement in crud.py.
+
+Any statement whose plan contains a full ``SCAN`` of a watched table
+(``books`` and ``books_view`` by default) is reported. Usage:
+
+    python query_plan.py              # against a fresh in-memory schema
+    python query_plan.py --db library.db
+"""
+import argparse
+import ast
+import pathlib
+import re
+import sqlite3
+import sys
+
+from database import apply_migrations, apply_books_view
+
+CRUD_PATH = pathlib.Path(__file__).with_name("crud.py")
+WATCHED_TABLES = ("books", "books_view")
+
+_SQL_KEYWORDS = {
+    "where", "on", "left", "right", "inner", "outer", "cross", "join",
+    "limit", "order", "group", "having", "using", "natural", "union",
+}
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def _literal(node, constants):
+    """Fold string constants, module-level string names and ``+`` into one string."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return constants.get(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _literal(node.left, constants), _literal(node.right, constants)
+        if left is not None and right is not None:
+            return left + right
+    return None
+
+
+def extract_statements(path=CRUD_PATH):
+    """Return ``(line, sql)`` for every string passed to execute/executemany."""
+    tree = ast.parse(pathlib.Path(path).read_text(), filename=str(path))
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = _literal(node.value, constants)
+            if value is not None:
+                constants[node.targets[0].id] = value
+    statements = []
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr in ("execute", "executemany")
+            and node.args
+        ):
+            sql = _literal(node.args[0], constants)
+            if sql is not None:
+                statements.append((node.lineno, " ".join(sql.split())))
+    return sorted(statements)
+
+
+def _aliases(sql):
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def explain(conn, sql):
+    """Return the plan detail lines for ``sql``, binding NULL to every parameter."""
+    params = (None,) * sql.count("?")
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check(conn, statements, watched=WATCHED_TABLES):
+    """Return ``(line, sql, detail)`` for every full scan of a watched table."""
+    problems = []
+    for line, sql in statements:
+        aliases = _aliases(sql)
+        for detail in explain(conn, sql):
+            match = _SCAN.match(detail)
+            if match and aliases.get(match.group(1).lower(), match.group(1).lower()) in watched:
+                problems.append((line, sql, detail))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="check against an existing database instead of a fresh schema")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        conn = sqlite3.connect(pathlib.Path(args.db).absolute().as_uri() + "?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(":memory:")
+        apply_migrations(conn)
+        # Optional, but crud has statements against it
+        apply_books_view(conn, enabled=True)
+
+    statements = extract_statements()
+    problems = check(conn, statements)
+    for line, sql, detail in problems:
+        print(f"crud.py:{line}: {detail}\n    {sql}")
+    print(f"{len(statements)} statements checked, {len(problems)} full scans")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
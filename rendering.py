@@ -0,0 +1,129 @@
+# rendering.py
+"""Fast JSON rendering for rows that crud already built from sqlite3.Row.
+
+FastAPI validates every returned dict against ``response_model`` and then
+serializes it again. The rows here come straight from our own tables, so
+in fast mode each response model is compiled once into a string template
+and rows are encoded directly to bytes. The output is byte-for-byte what
+FastAPI would send, and routes keep their ``response_model`` so the
+OpenAPI schema does not change.
+
+Set ``LIBRARY_RENDER_MODE=model`` to go back to FastAPI's own path, or
+``sql`` to additionally have SQLite build the nested author documents
+with JSON1 (crud.get_author_json/get_authors_json), so those bytes pass
+through without any per-row Python objects.
+"""
+import json
+import os
+import typing
+
+from fastapi import Response
+from pydantic import BaseModel
+
+RENDER_MODES = ("fast", "sql", "model")
+RENDER_MODE = os.environ.get("LIBRARY_RENDER_MODE", "fast")
+if RENDER_MODE not in RENDER_MODES:
+    raise ValueError(f"Unknown LIBRARY_RENDER_MODE {RENDER_MODE!r}, expected one of {RENDER_MODES}")
+
+# Same escaping FastAPI's JSONResponse uses (ensure_ascii=False)
+_encode_str = json.encoder.encode_basestring
+_encode_float = float.__repr__
+# Strict: anything but an int raises instead of rendering something odd
+_encode_int = int.__repr__
+
+
+def _nullable(encode):
+    def encode_or_null(value):
+        return "null" if value is None else encode(value)
+    return encode_or_null
+
+
+def _list_of(encode):
+    def encode_list(values):
+        return "[" + ",".join(map(encode, values)) + "]"
+    return encode_list
+
+
+def _encoder_for(annotation):
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union:
+        inner = [arg for arg in args if arg is not type(None)]
+        if len(inner) != 1:
+            raise TypeError(f"Unsupported union {annotation!r}")
+        return _nullable(_encoder_for(inner[0]))
+    if origin in (list, typing.List):
+        return _list_of(_encoder_for(args[0]))
+    if origin is typing.Literal or annotation is str:
+        return _encode_str
+    if annotation is int:
+        return _encode_int
+    if annotation is float:
+        return _encode_float
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return compile_model(annotation)
+    raise TypeError(f"No fast encoder for {annotation!r}")
+
+
+_compiled = {}
+
+
+def compile_model(model):
+    """Return a function encoding a dict with ``model``'s fields to a JSON string.
+
+    The function is generated source (the way dataclasses builds __init__)
+    so each row costs one format operation with no per-field loop.
+    """
+    encoder = _compiled.get(model)
+    if encoder is not None:
+        return encoder
+
+    namespace = {}
+    template = []
+    lines = ["def encode(row):"]
+    values = []
+    for i, (name, field) in enumerate(model.model_fields.items()):
+        template.append(("{" if i == 0 else ",") + _encode_str(name) + ":%s")
+        namespace[f"e{i}"] = _encoder_for(field.annotation)
+        if field.is_required():
+            lines.append(f"    v{i} = row[{name!r}]")
+        else:
+            # Fields with defaults may also be missing from the row
+            namespace[f"d{i}"] = field.get_default(call_default_factory=True)
+            lines.append(f"    v{i} = row.get({name!r}, d{i})")
+        values.append(f"'null' if v{i} is None else e{i}(v{i})")
+    template = "".join(template) + "}"
+    lines.append(f"    return {template!r} % ({', '.join(values)},)")
+    exec("\n".join(lines), namespace)
+
+    encoder = _compiled[model] = namespace["encode"]
+    return encoder
+
+
+def render(model, data, many=False) -> bytes:
+    encode = compile_model(model)
+    if many:
+        return ("[" + ",".join(map(encode, data)) + "]").encode("utf-8")
+    return encode(data).encode("utf-8")
+
+
+def respond(model, data, response: Response = None, many=False):
+    """Return ``data`` ready for the route to return.
+
+    In model mode this is ``data`` itself and FastAPI does the work. In fast
+    mode it is a pre-rendered Response carrying any headers already set on
+    the route's injected ``response``.
+    """
+    if RENDER_MODE == "model":
+        return data
+    return respond_raw(render(model, data, many=many), response)
+
+
+def respond_raw(body, response: Response = None):
+    """Wrap an already encoded JSON document, copying headers from ``response``."""
+    raw = Response(content=body, media_type="application/json")
+    if response is not None:
+        for name, value in response.headers.items():
+            if name != "content-length":
+                raw.headers[name] = value
+    return raw
@@ -1,67 +1,425 @@
-from database import get_db_connection
+import argparse
+import bisect
+import contextlib
+import json
+import math
+import random
+import time
 
-def seed_database():
-    """Seed the database with initial data."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Seed Authors
-        authors_data = [
-            ("J.K. Rowling",),
-            ("George R.R. Martin",)
-        ]
-        cursor.executemany('INSERT INTO authors (name) VALUES (?)', authors_data)
-        
-        # Seed Genres
-        genres_data = [
-            ("Fantasy",),
-            ("Science Fiction",)
-        ]
-        cursor.executemany('INSERT INTO genres (name) VALUES (?)', genres_data)
-        
-        # Seed Books
-        books_data = [
-            ("Harry Potter and the Philosopher's Stone", 
-             "The first book in the Harry Potter series", 1, 1),
-            ("A Game of Thrones", 
-             "The first book of A Song of Ice and Fire series", 2, 1),
-            ("Harry Potter and the Chamber of Secrets", 
-             "The second book in the Harry Potter series", 1, 1),
-            ("A Clash of Kings", 
-             "The second book of A Song of Ice and Fire series", 2, 1)
-        ]
-        cursor.executemany('''
-            INSERT INTO books (title, description, author_id, genre_id) 
-            VALUES (?, ?, ?, ?)
-        ''', books_data)
-        
-        conn.commit()
-        
+import database
+from database import get_db_connection, execute_write, submit_write, bulk_load, notify_write
+
+# Synthetic catalog defaults
+DEFAULT_SEED = 42
+CHUNK_SIZE = 10_000
+CHUNKS_PER_TRANSACTION = 10
+# Zipf exponents: how strongly books concentrate on a few authors / genres
+AUTHOR_SKEW = 1.1
+GENRE_SKEW = 1.3
+
+def seed_database(authors=None, genres=None, books=None, seed=DEFAULT_SEED, progress=None,
+                  chunk_size=CHUNK_SIZE, chunks_per_transaction=CHUNKS_PER_TRANSACTION, bulk=True):
+    """Seed the database with initial data.
+
+    Without counts this loads the small sample catalog. With counts it
+    generates a synthetic catalog of that size (see generate_catalog) and
+    the result also carries the ``load`` report.
+    """
+    if authors is None and genres is None and books is None:
+        execute_write(_insert_seed_data)
+        notify_write('authors', 'genres', 'books')
         return get_db_stats()
+    report = generate_catalog(authors or 0, genres or 0, books or 0, seed=seed, progress=progress,
+                              chunk_size=chunk_size, chunks_per_transaction=chunks_per_transaction,
+                              bulk=bulk)
+    return {**get_db_stats(), "load": report}
+
+def _insert_seed_data(conn):
+    """Insert the sample catalog; runs as a write job."""
+    cursor = conn.cursor()
+    
+    # The database now survives restarts, so only seed an empty catalog
+    cursor.execute('SELECT 1 FROM authors LIMIT 1')
+    if cursor.fetchone():
+        return
+    
+    # Seed Authors, keeping the ids they were given
+    rowling, martin = "J.K. Rowling", "George R.R. Martin"
+    author_ids = {}
+    for name in (rowling, martin):
+        cursor.execute('INSERT INTO authors (name) VALUES (?)', (name,))
+        author_ids[name] = cursor.lastrowid
+    
+    # Seed Genres; a genre of the same name may already have been created
+    genres_data = [
+        ("Fantasy",),
+        ("Science Fiction",)
+    ]
+    cursor.executemany('INSERT OR IGNORE INTO genres (name) VALUES (?)', genres_data)
+    cursor.execute('SELECT name, id FROM genres WHERE name IN (?, ?)',
+                   [row[0] for row in genres_data])
+    genre_ids = dict(cursor.fetchall())
+    
+    # Seed Books
+    books_data = [
+        ("Harry Potter and the Philosopher's Stone", 
+         "The first book in the Harry Potter series", author_ids[rowling], genre_ids["Fantasy"]),
+        ("A Game of Thrones", 
+         "The first book of A Song of Ice and Fire series", author_ids[martin], genre_ids["Fantasy"]),
+        ("Harry Potter and the Chamber of Secrets", 
+         "The second book in the Harry Potter series", author_ids[rowling], genre_ids["Fantasy"]),
+        ("A Clash of Kings", 
+         "The second book of A Song of Ice and Fire series", author_ids[martin], genre_ids["Fantasy"])
+    ]
+    cursor.executemany('''
+        INSERT INTO books (title, description, author_id, genre_id) 
+        VALUES (?, ?, ?, ?)
+    ''', books_data)
+
+
+# Word lists for synthetic rows
+_FIRST_NAMES = (
+    "Ada", "Alan", "Amara", "Ana", "Ben", "Chen", "Clara", "Dmitri", "Elena", "Emeka",
+    "Farah", "Grace", "Hana", "Hugo", "Ines", "Ivan", "James", "Jun", "Kofi", "Lena",
+    "Liam", "Maya", "Mei", "Nadia", "Noah", "Olga", "Omar", "Priya", "Rafael", "Rosa",
+    "Sam", "Sofia", "Tariq", "Ursula", "Victor", "Wen", "Yara", "Yusuf", "Zoe", "Zora",
+)
+_LAST_NAMES = (
+    "Abbott", "Adeyemi", "Alvarez", "Bauer", "Becker", "Brooks", "Castillo", "Chen", "Costa", "Dubois",
+    "Eriksson", "Fischer", "Garcia", "Gupta", "Haddad", "Hansen", "Ito", "Ivanova", "Jensen", "Kaur",
+    "Kim", "Kowalski", "Larsen", "Lopez", "Mbeki", "Moreau", "Murphy", "Nakamura", "Novak", "Okafor",
+    "Olsen", "Park", "Patel", "Petrov", "Quinn", "Rossi", "Santos", "Schmidt", "Silva", "Singh",
+    "Sato", "Tanaka", "Torres", "Ueda", "Varga", "Walsh", "Weber", "Wright", "Yilmaz", "Zhang",
+)
+_GENRES = (
+    "Fantasy", "Science Fiction", "Mystery", "Thriller", "Romance", "Horror", "Historical Fiction",
+    "Literary Fiction", "Biography", "Memoir", "History", "Poetry", "Philosophy", "Science",
+    "Travel", "Cooking", "Art", "Religion", "Business", "Economics", "Politics", "Psychology",
+    "Self-Help", "Health", "Children's", "Young Adult", "Graphic Novel", "Drama", "Humor", "Essays",
+)
+_GENRE_QUALIFIERS = (
+    "Classics", "Anthology", "Short Stories", "Epic", "Contemporary", "Noir", "Cozy", "Military",
+    "Urban", "Gothic", "Hard", "Space", "Regency", "Nordic", "Speculative", "Translated",
+)
+_ADJECTIVES = (
+    "Silent", "Crimson", "Hidden", "Last", "Broken", "Golden", "Distant", "Forgotten", "Burning",
+    "Quiet", "Endless", "Hollow", "Winter", "Secret", "Wild", "Glass", "Iron", "Lost", "Salt", "Paper",
+)
+_NOUNS = (
+    "River", "Kingdom", "Garden", "City", "Orchard", "Harbor", "Mirror", "Forest", "Tower", "Sea",
+    "Storm", "Letter", "Road", "Island", "Crown", "House", "Bridge", "Mountain", "Star", "Archive",
+)
+_TOPICS = (
+    "family", "war", "love", "memory", "exile", "ambition", "friendship", "grief", "power", "faith",
+    "survival", "home", "revenge", "discovery", "betrayal", "time",
+)
+
+
+class ZipfSampler:
+    """Draw indexes ``0..n-1`` with Zipf(``skew``) weights in O(1) time and memory.
+
+    Ranks come from the inverse CDF of the continuous power law, which is
+    close enough to the discrete one for load testing and needs no weight
+    table. Ranks are then spread over the indexes with a fixed offset and a
+    stride coprime to ``n``, so the popular rows are not simply the first ids.
+    """
+
+    def __init__(self, n, skew, rng):
+        self.n = n
+        self.skew = skew
+        self._span = math.log(n + 1) if skew == 1 else (n + 1) ** (1 - skew) - 1
+        stride = rng.randrange(1, n + 1) | 1
+        while math.gcd(stride, n) != 1:
+            stride += 2
+        self._stride = stride
+        self._offset = rng.randrange(n)
+
+    def rank(self, u):
+        """Map ``u`` in [0, 1) to a 0-based rank; low ranks are the most likely."""
+        if self.skew == 1:
+            x = math.exp(u * self._span)
+        else:
+            x = (1 + u * self._span) ** (1 / (1 - self.skew))
+        return min(int(x), self.n) - 1
+
+    def sample(self, rng):
+        return (self.rank(rng.random()) * self._stride + self._offset) % self.n
+
+
+class _IdRanges:
+    """Map a 0-based row index to the id it was given, from contiguous id ranges."""
+
+    def __init__(self):
+        self._offsets = []
+        self._firsts = []
+        self.count = 0
+
+    def add(self, first_id, count):
+        self._offsets.append(self.count)
+        self._firsts.append(first_id)
+        self.count += count
+
+    def __getitem__(self, index):
+        i = bisect.bisect_right(self._offsets, index) - 1
+        return self._firsts[i] + index - self._offsets[i]
+
+
+def _chunk_rng(seed, table, chunk):
+    # Seeded per chunk so a chunk's rows do not depend on how the others were drawn
+    return random.Random(f"{seed}:{table}:{chunk}")
+
+
+def _author_rows(seed, chunk, count):
+    rng = _chunk_rng(seed, "authors", chunk)
+    return [
+        (f"{rng.choice(_FIRST_NAMES)} {chr(65 + rng.randrange(26))}. {rng.choice(_LAST_NAMES)}",)
+        for _ in range(count)
+    ]
+
 
-def get_db_stats():
-    """Get statistics about the seeded data."""
+def _genre_name(index):
+    base = _GENRES[index % len(_GENRES)]
+    round_ = index // len(_GENRES)
+    if round_ == 0:
+        return base
+    qualifier = _GENRE_QUALIFIERS[(round_ - 1) % len(_GENRE_QUALIFIERS)]
+    if round_ <= len(_GENRE_QUALIFIERS):
+        return f"{base}: {qualifier}"
+    return f"{base}: {qualifier} {round_}"
+
+
+def _book_rows(seed, chunk, count, author_ids, genre_ids, author_sampler, genre_sampler):
+    rng = _chunk_rng(seed, "books", chunk)
+    rows = []
+    for _ in range(count):
+        adjective, noun = rng.choice(_ADJECTIVES), rng.choice(_NOUNS)
+        if rng.random() < 0.5:
+            title = f"The {adjective} {noun}"
+        else:
+            title = f"{noun} of the {adjective} {rng.choice(_NOUNS)}"
+        if rng.random() < 0.2:
+            title += f", Book {rng.randrange(2, 8)}"
+        description = (
+            f"A story of {rng.choice(_TOPICS)} and {rng.choice(_TOPICS)} "
+            f"set beside a {adjective.lower()} {noun.lower()}."
+        )
+        rows.append((
+            title,
+            description,
+            author_ids[author_sampler.sample(rng)],
+            genre_ids[genre_sampler.sample(rng)],
+        ))
+    return rows
+
+
+def _insert_authors(conn, chunks):
+    """Insert author chunks; runs as a write job. Returns each chunk's first id."""
+    firsts = []
+    for rows in chunks:
+        conn.executemany('INSERT INTO authors (name) VALUES (?)', rows)
+        # Rowids within a chunk are contiguous: this is the only writer
+        last = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        firsts.append(last - len(rows) + 1)
+    return firsts
+
+
+def _insert_genres(conn, chunks):
+    """Insert genre chunks, reusing genres of the same name; returns their ids."""
+    ids = []
+    for rows in chunks:
+        conn.executemany('INSERT OR IGNORE INTO genres (name) VALUES (?)', rows)
+        found = dict(conn.execute(
+            'SELECT name, id FROM genres WHERE name IN (SELECT value FROM json_each(?))',
+            (json.dumps([row[0] for row in rows]),),
+        ).fetchall())
+        ids.extend(found[row[0]] for row in rows)
+    return ids
+
+
+def _insert_books(conn, chunks):
+    for rows in chunks:
+        conn.executemany('''
+            INSERT INTO books (title, description, author_id, genre_id)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+
+
+def _load(table, total, make_chunk, insert, on_result, progress,
+          chunk_size=CHUNK_SIZE, chunks_per_transaction=CHUNKS_PER_TRANSACTION):
+    """Insert ``total`` rows, several executemany chunks per write transaction.
+
+    Rows for the next transaction are generated while the writer commits
+    the previous one. Returns ``(rows, seconds)``.
+    """
+    started = time.perf_counter()
+    pending = None
+    generated = committed = chunk = 0
+    while generated < total or pending is not None:
+        transaction = []
+        while generated < total and len(transaction) < chunks_per_transaction:
+            count = min(chunk_size, total - generated)
+            transaction.append(make_chunk(chunk, count))
+            generated += count
+            chunk += 1
+        if pending is not None:
+            future, counts = pending
+            on_result(future.result(), counts)
+            committed += sum(counts)
+            if progress is not None:
+                progress(table, committed, total)
+        pending = None
+        if transaction:
+            pending = submit_write(insert, transaction), [len(rows) for rows in transaction]
+    return total, time.perf_counter() - started
+
+
+def _rate(rows, seconds):
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds else 0,
+    }
+
+
+def generate_catalog(authors, genres, books, seed=DEFAULT_SEED, progress=None,
+                     chunk_size=CHUNK_SIZE, chunks_per_transaction=CHUNKS_PER_TRANSACTION, bulk=True):
+    """Bulk-load a synthetic catalog and return rows per second per table.
+
+    The same ``seed`` on the same starting catalog produces the same rows.
+    Books pick their author and genre from Zipf distributions, so a few
+    authors are prolific and most genres are a long tail. Rows are
+    appended to what is already there; a generated genre name that
+    already exists is reused. ``progress(table, rows_done, rows_total)``
+    is called after each committed transaction.
+
+    With ``bulk`` the load runs under database.bulk_load(). Those settings
+    cover every write the writer commits meanwhile, so a load running next
+    to request traffic passes ``bulk=False`` and keeps normal durability.
+    """
+    if books and (not authors or not genres):
+        raise ValueError("books need at least one author and one genre")
+    author_ids = _IdRanges()
+    genre_ids = []
+    samplers = []
+    sizes = {"chunk_size": chunk_size, "chunks_per_transaction": chunks_per_transaction}
+
+    def add_authors(firsts, counts):
+        for first, count in zip(firsts, counts):
+            author_ids.add(first, count)
+
+    def book_chunk(chunk, count):
+        return _book_rows(seed, chunk, count, author_ids, genre_ids, *samplers)
+
+    report = {}
+    started = time.perf_counter()
+    try:
+        with bulk_load() if bulk else contextlib.nullcontext():
+            report["authors"] = _rate(*_load(
+                "authors", authors, lambda chunk, count: _author_rows(seed, chunk, count),
+                _insert_authors, add_authors, progress, **sizes))
+            report["genres"] = _rate(*_load(
+                "genres", genres,
+                lambda chunk, count: [(_genre_name(chunk * chunk_size + i),) for i in range(count)],
+                _insert_genres, lambda ids, counts: genre_ids.extend(ids), progress, **sizes))
+            if books:
+                rng = random.Random(f"{seed}:samplers")
+                samplers[:] = [ZipfSampler(author_ids.count, AUTHOR_SKEW, rng),
+                               ZipfSampler(len(genre_ids), GENRE_SKEW, rng)]
+            report["books"] = _rate(*_load(
+                "books", books, book_chunk, _insert_books,
+                lambda result, counts: None, progress, **sizes))
+    finally:
+        # Transactions committed before a failure are visible as well
+        notify_write('authors', 'genres', 'books')
+    report["total"] = _rate(authors + genres + books, time.perf_counter() - started)
+    return report
+
+STATS_LISTINGS = ("authors", "genres", "books")
+
+def get_db_stats(include=(), limit: int = 100, after: int = 0):
+    """Get statistics about the catalog.
+
+    Row counts come from the trigger-maintained row_counts table, so they
+    cost the same at any size. ``include`` adds id-ordered listings
+    (authors and genres with their book counts, books with their author),
+    ``limit`` rows each, starting after id ``after``.
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Get authors
-        cursor.execute('SELECT name FROM authors')
-        authors = [row[0] for row in cursor.fetchall()]
+        # Get row counts
+        cursor.execute('SELECT name, count FROM row_counts')
+        stats = {"counts": {row[0]: row[1] for row in cursor.fetchall()}}
+        
+        # Get authors with their book counts
+        if "authors" in include:
+            cursor.execute('''
+                SELECT a.id, a.name, coalesce(c.count, 0) AS books
+                FROM authors a
+                LEFT JOIN author_book_counts c ON c.author_id = a.id
+                WHERE a.id > ?
+                ORDER BY a.id
+                LIMIT ?
+            ''', (after, limit))
+            stats["authors"] = [dict(row) for row in cursor.fetchall()]
         
-        # Get genres
-        cursor.execute('SELECT name FROM genres')
-        genres = [row[0] for row in cursor.fetchall()]
+        # Get genres with their book counts
+        if "genres" in include:
+            cursor.execute('''
+                SELECT g.id, g.name, coalesce(c.count, 0) AS books
+                FROM genres g
+                LEFT JOIN genre_book_counts c ON c.genre_id = g.id
+                WHERE g.id > ?
+                ORDER BY g.id
+                LIMIT ?
+            ''', (after, limit))
+            stats["genres"] = [dict(row) for row in cursor.fetchall()]
         
         # Get books with author names
-        cursor.execute('''
-            SELECT b.title, a.name as author
-            FROM books b
-            JOIN authors a ON b.author_id = a.id
-        ''')
-        books = [(row[0], row[1]) for row in cursor.fetchall()]
+        if "books" in include:
+            cursor.execute('''
+                SELECT b.id, b.title, a.name as author
+                FROM books b
+                LEFT JOIN authors a ON b.author_id = a.id
+                WHERE b.id > ?
+                ORDER BY b.id
+                LIMIT ?
+            ''', (after, limit))
+            stats["books"] = [dict(row) for row in cursor.fetchall()]
         
-        return {
-            "authors": authors,
-            "genres": genres,
-            "books": books
-        }
\ No newline at end of file
+        return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the library database.")
+    parser.add_argument("--db", help=f"database file (default {database.DATABASE_NAME})")
+    parser.add_argument("--authors", type=int, help="synthetic authors to generate")
+    parser.add_argument("--genres", type=int, help="synthetic genres to generate")
+    parser.add_argument("--books", type=int, help="synthetic books to generate")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="random seed")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per executemany")
+    parser.add_argument("--chunks-per-transaction", type=int, default=CHUNKS_PER_TRANSACTION)
+    args = parser.parse_args(argv)
+    if args.db:
+        database.DATABASE_NAME = args.db
+    database.init_db()
+
+    def progress(table, done, total):
+        print(f"{table}: {done}/{total}", flush=True)
+
+    try:
+        if args.authors is None and args.genres is None and args.books is None:
+            result = seed_database()
+        else:
+            report = generate_catalog(
+                args.authors or 0, args.genres or 0, args.books or 0, seed=args.seed,
+                progress=progress, chunk_size=args.chunk_size,
+                chunks_per_transaction=args.chunks_per_transaction,
+            )
+            result = {**get_db_stats(), "load": report}
+    finally:
+        database.close_db()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# tests/test_query_count.py
+"""An author page costs the same number of statements at any page size."""
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import http_cache
+import main
+import seeder
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    database.close_db()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(database, "DATABASE_NAME", str(tmp_path_factory.mktemp("db") / "library.db"))
+        try:
+            with TestClient(main.app) as client:
+                seeder.seed_database(authors=200, genres=5, books=2000)
+                yield client
+        finally:
+            # Nothing may keep using the temporary database after this module
+            database.close_db()
+            http_cache.cache.clear()
+
+
+def test_author_page_query_count_is_constant(client):
+    counts = {}
+    for limit in (1, 10, 100):
+        response = client.get("/authors/", params={"limit": limit})
+        assert response.status_code == 200
+        assert len(response.json()) == limit
+        counts[limit] = int(response.headers["X-DB-Queries"])
+    assert len(set(counts.values())) == 1, counts